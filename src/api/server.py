@@ -0,0 +1,228 @@
+"""
+Headless HTTP API over the agent graph, for load balancers and other services.
+
+All requests share one compiled graph, index store and set of model clients. At most
+API_MAX_CONCURRENCY graph runs execute at once; up to API_MAX_QUEUE more wait for a
+slot, and anything beyond that is answered with 503 and a Retry-After header.
+
+    cd src && python -m api.server
+    curl -X POST localhost:8000/query -H 'Content-Type: application/json' -d '{"question": "What is LLM orchestration?"}'
+"""
+import json
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from sse_starlette.sse import EventSourceResponse
+
+from logger import logger
+from core.config import settings
+from core.index_store import index_store
+from core.multi_graph import arun_graph, astream_graph, build_initial_graph_state, create_graph
+from core.warmup import start_warm_up
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot get a graph worker; answered with 503."""
+
+
+class AdmissionGate:
+    """
+    Bounds concurrent graph runs. `concurrency` requests run at once and up to `max_queue`
+    more wait for a slot; beyond that, or after waiting `queue_timeout` seconds, requests
+    are turned away instead of piling up behind a saturated provider.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.API_MAX_CONCURRENCY,
+        max_queue: int = settings.API_MAX_QUEUE,
+        queue_timeout: float = settings.API_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        # Requests admitted and not finished yet, running or waiting for a slot.
+        self.admitted = 0
+        self.running = 0
+        self.rejected = 0
+
+    def check(self, count: int = 1) -> None:
+        """Raise `Overloaded` if `count` more requests would not fit in the queue."""
+        if self.admitted + count > self.concurrency + self.max_queue:
+            self.rejected += count
+            raise Overloaded(f"{self.admitted} requests in flight")
+
+    @contextmanager
+    def admit(self, count: int = 1) -> Iterator[None]:
+        """Hold `count` places in the queue, or reject them all if it has no room."""
+        self.check(count)
+        self.admitted += count
+        try:
+            yield
+        finally:
+            self.admitted -= count
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Run one admitted request once a slot is free."""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"no free worker within {self.queue_timeout:g}s")
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.admitted - self.running,
+            "rejected": self.rejected,
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1, description="Question to answer")
+    reference_docs: List[Dict[str, Any]] = Field(default_factory=list, description="Answer from these documents only")
+    include_spans: bool = Field(default=False, description="Return the request's trace spans")
+
+
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=settings.API_MAX_BATCH_SIZE, description="Questions to answer")
+    include_spans: bool = Field(default=False, description="Return each request's trace spans")
+
+
+def _initial_state(question: str, reference_docs: List[Dict[str, Any]]) -> dict:
+    state = build_initial_graph_state(question)
+    state["reference_docs"] = reference_docs
+    state["queries"] = [question]
+    return state
+
+
+def _response(question: str, final_state: dict, include_spans: bool) -> dict:
+    trace = final_state.get("trace", [])
+    response = {
+        "question": question,
+        "answer": final_state.get("final_answer", ""),
+        "documents": final_state.get("retrieved_docs", []),
+        "iterations": final_state.get("iteration", 0),
+        "trace": trace,
+        "cached": "answer_cache" in trace,
+        # Set when a node timed out or the request ran out of time or tokens.
+        "degraded": bool(final_state.get("logs", {}).get("budget")),
+    }
+    if include_spans:
+        response["spans"] = final_state.get("spans", [])
+    return response
+
+
+async def _answer(app: FastAPI, question: str, reference_docs: List[Dict[str, Any]], include_spans: bool) -> dict:
+    async with app.state.gate.slot():
+        final_state = await arun_graph(app.state.graph, _initial_state(question, reference_docs))
+    return _response(question, final_state, include_spans)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One compiled graph for every request; the index store and model clients are process-wide already.
+    app.state.graph = create_graph()
+    # Created here so its semaphore belongs to the server's event loop.
+    app.state.gate = AdmissionGate()
+    if settings.WARMUP_ENABLED:
+        start_warm_up()
+    yield
+
+
+app = FastAPI(title="Lumigo API", description=__doc__, lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded) -> JSONResponse:
+    logger.warning(f"[API] Rejected {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": f"Server is busy: {exc}"},
+                        headers={"Retry-After": str(max(1, round(request.app.state.gate.queue_timeout)))})
+
+
+@app.post("/query")
+async def query(request: Request, body: QueryRequest) -> dict:
+    """Answer one question."""
+    try:
+        with request.app.state.gate.admit():
+            return await _answer(request.app, body.question, body.reference_docs, body.include_spans)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error(f"[API] Query failed: {e}")
+        raise HTTPException(status_code=500, detail=type(e).__name__)
+
+
+@app.post("/batch")
+async def batch(request: Request, body: BatchRequest) -> dict:
+    """
+    Answer several questions concurrently. The whole batch is admitted or rejected up
+    front; a question that fails does not fail the others.
+    """
+    with request.app.state.gate.admit(len(body.questions)):
+        results = await asyncio.gather(
+            *(_answer(request.app, question, [], body.include_spans) for question in body.questions),
+            return_exceptions=True,
+        )
+    for question, result in zip(body.questions, results):
+        if isinstance(result, BaseException):
+            logger.error(f"[API] Batch question failed: {result!r}")
+    return {"results": [
+        {"question": question, "error": type(result).__name__} if isinstance(result, BaseException) else result
+        for question, result in zip(body.questions, results)
+    ]}
+
+
+@app.post("/stream")
+async def stream(request: Request, body: QueryRequest) -> EventSourceResponse:
+    """
+    Server-sent events: `node` as each graph node finishes, `answer_start` and `token` while
+    the answer is generated, then `final` with the same body as /query, or `error`.
+    """
+    # Rejected with a 503 while the queue is full; a stream that then waits too long for
+    # a slot can only report it as an `error` event.
+    gate = request.app.state.gate
+    gate.check()
+    graph = request.app.state.graph
+
+    async def events() -> AsyncIterator[dict]:
+        try:
+            with gate.admit():
+                async with gate.slot():
+                    async for kind, payload in astream_graph(graph, _initial_state(body.question, body.reference_docs)):
+                        if kind == "final":
+                            payload = _response(body.question, payload, body.include_spans)
+                        yield {"event": kind, "data": json.dumps(payload, ensure_ascii=False, default=str)}
+        except Overloaded as e:
+            yield {"event": "error", "data": json.dumps({"detail": f"Server is busy: {e}"})}
+        except Exception as e:
+            logger.error(f"[API] Stream failed: {e}")
+            yield {"event": "error", "data": json.dumps({"detail": type(e).__name__})}
+
+    return EventSourceResponse(events())
+
+
+@app.get("/health")
+async def health(request: Request) -> dict:
+    return {"status": "ok", "index_loaded": await index_store.asnapshot() is not None, **request.app.state.gate.stats()}
+
+
+if __name__ == "__main__":
+    # A single worker process: the graph, index and models are shared in memory, and
+    # concurrency comes from API_MAX_CONCURRENCY. Scale out with more containers.
+    uvicorn.run(app, host=settings.API_HOST, port=settings.API_PORT)
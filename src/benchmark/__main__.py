@@ -0,0 +1,74 @@
+"""
+Offline component benchmarks with stand-in providers.
+
+    cd src && python -m benchmark --documents 10000
+    python -m benchmark --documents 100000 --stages build,search --compare storage/benchmarks/<previous>.json
+"""
+import json
+import shutil
+import argparse
+
+from benchmark import sandbox
+
+STAGES = ("build", "load", "search", "prompt", "graph")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10_000, help="synthetic corpus size (10k-1M)")
+    parser.add_argument("--words-per-doc", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200, help="questions for the search and prompt stages")
+    parser.add_argument("--graph-questions", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10, help="results per search")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent callers for the search QPS run")
+    parser.add_argument("--index-type", default=None, help="override FAISS_INDEX_TYPE (auto, flat, ivf_flat, hnsw, ivf_pq)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument("--llm-latency", type=float, default=None, help="stand-in LLM seconds per call")
+    parser.add_argument("--llm-token-latency", type=float, default=None, help="stand-in LLM seconds per token")
+    parser.add_argument("--embedding-latency", type=float, default=None, help="stand-in embedding seconds per request")
+    parser.add_argument("--workdir", default=None, help="sandbox for the index and caches (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default=None, help="results file or directory (default: storage/benchmarks/)")
+    parser.add_argument("--compare", default=None, help="previous results file to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    workdir = sandbox.configure(args.workdir, llm_latency=args.llm_latency, llm_token_latency=args.llm_token_latency,
+                                embedding_latency=args.embedding_latency)
+
+    # Settings are read on first import of `core`, so the suite is imported only now.
+    from benchmark.metrics import compare, environment, print_comparison, run_config, write_results
+    from benchmark.suite import run_suite
+
+    try:
+        results = run_suite(args.documents, args.words_per_doc, args.queries, args.graph_questions,
+                            args.k, args.threads, args.index_type, stages, args.seed)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "name": "components",
+        "environment": environment(),
+        "config": run_config(args),
+        "results": results,
+    }
+    path = write_results(report, args.output)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(compare(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
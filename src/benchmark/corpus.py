@@ -0,0 +1,60 @@
+import random
+from typing import List
+
+from langchain.docstore.document import Document
+
+from core.build_faiss_index import load_source_publications, publication_hash
+
+QUESTION_TEMPLATES = (
+    "What is {topic}?",
+    "Tell me about {topic}",
+    "What are the main ideas of {topic}?",
+    "How does {topic} work in practice?",
+    "Compare approaches described in {topic}",
+    "Which methods are used in {topic}?",
+)
+
+
+def _base_corpus() -> List[tuple]:
+    publications = load_source_publications()
+    if not publications:
+        raise RuntimeError("No source publications found in the data directory")
+    return [(pub.get("title", ""), pub.get("publication_description", "").split()) for pub in publications]
+
+
+def synthetic_documents(count: int, words_per_doc: int = 200, seed: int = 0) -> List[Document]:
+    """
+    Scale the source publications to `count` documents. Each one is a window of about
+    `words_per_doc` words from a source publication with a tenth of its words swapped for
+    words from elsewhere in the corpus, so no two documents embed identically. Documents
+    are already in the indexer's shape (enrichment is not part of the index build benchmark).
+    """
+    rng = random.Random(seed)
+    base = _base_corpus()
+    vocabulary = sorted({word for _, words in base for word in words})
+    substitutions = max(1, words_per_doc // 10)
+
+    documents = []
+    for i in range(count):
+        title, words = base[i % len(base)]
+        start = rng.randrange(max(1, len(words) - words_per_doc))
+        window = words[start:start + words_per_doc] or [title]
+        for position in rng.sample(range(len(window)), min(substitutions, len(window))):
+            window[position] = rng.choice(vocabulary)
+        content = " ".join(window)
+        documents.append(Document(
+            page_content=content,
+            metadata={'id': f"synthetic:{i}",
+                      'content_hash': publication_hash(title, content),
+                      'source': f"{title} ({i})",
+                      'summary': " ".join(window[:30]),
+                      'tags': []},
+        ))
+    return documents
+
+
+def synthetic_questions(count: int, seed: int = 0) -> List[str]:
+    """Questions about the source publications' titles, in a mix of explore and direct phrasings."""
+    rng = random.Random(seed)
+    titles = [title for title, _ in _base_corpus() if title]
+    return [rng.choice(QUESTION_TEMPLATES).format(topic=rng.choice(titles)) for _ in range(count)]
@@ -0,0 +1,229 @@
+"""
+Concurrent end-to-end load generator for the agent graph.
+
+Sends synthetic questions, or replays a request log given with --requests (JSON lines
+with a "question" or "query" field, or plain text lines), through `arun_graph` at a fixed
+concurrency, either closed-loop (each worker sends its next question as soon as the previous
+one finishes) or open-loop at a Poisson arrival rate. Providers are the stand-ins by default;
+--provider replay serves replies recorded earlier with MODEL_PROVIDER=record.
+
+    cd src && python -m benchmark.loadgen --concurrency 1,4,16 --count 200
+    python -m benchmark.loadgen --provider replay --index existing --requests queries.jsonl --rate 5 --duration 60
+"""
+import os
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+from collections import Counter
+from typing import List
+
+from benchmark import sandbox
+
+
+def load_questions(path: str) -> List[str]:
+    """Questions from a request log; blank entries and records without a question are skipped."""
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                questions.append(line)
+                continue
+            if isinstance(record, str):
+                questions.append(record)
+            elif isinstance(record, dict):
+                question = next((record[key] for key in ("question", "query") if record.get(key)), None)
+                if question:
+                    questions.append(str(question))
+    return questions
+
+
+async def _request(graph, question: str, arrived: float, stream: bool) -> dict:
+    from core.multi_graph import arun_graph, astream_graph, build_initial_graph_state
+
+    state = build_initial_graph_state(question)
+    state["queries"] = [question]
+    started = time.perf_counter()
+    result = {"queue_ms": (started - arrived) * 1000, "ok": False}
+    try:
+        if stream:
+            final_state = {}
+            async for event, payload in astream_graph(graph, state):
+                if event == "token" and "first_token_ms" not in result:
+                    result["first_token_ms"] = (time.perf_counter() - arrived) * 1000
+                elif event == "final":
+                    final_state = payload
+        else:
+            final_state = await arun_graph(graph, state)
+        result.update(
+            ok=True,
+            answered=bool(final_state.get("final_answer")),
+            degraded=bool(final_state.get("logs", {}).get("budget")),
+            cached="answer_cache" in final_state.get("trace", []),
+            spans=final_state.get("spans", []),
+        )
+    except Exception as e:
+        result["error"] = type(e).__name__
+    result["service_ms"] = (time.perf_counter() - started) * 1000
+    result["latency_ms"] = result["queue_ms"] + result["service_ms"]
+    return result
+
+
+async def run_load(graph, questions: List[str], concurrency: int, count: int, rate: float = 0.0,
+                   duration: float = 0.0, stream: bool = False, seed: int = 0) -> dict:
+    """
+    Send up to `count` requests (or as many as fit in `duration` seconds) through `concurrency`
+    workers. With `rate` > 0 requests arrive as a Poisson process and queue for a free worker;
+    otherwise the run is closed-loop. Latency is measured from arrival, so it includes queueing.
+    """
+    rng = random.Random(seed)
+    # Closed loop: the next request is only released when a worker is ready to take it,
+    # so it arrives when the worker picks it up.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=0 if rate > 0 else 1)
+    results = []
+    started = time.perf_counter()
+
+    async def arrivals():
+        for i in range(count):
+            if duration and time.perf_counter() - started >= duration:
+                break
+            await queue.put((questions[i % len(questions)], time.perf_counter() if rate > 0 else None))
+            if rate > 0:
+                await asyncio.sleep(rng.expovariate(rate))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            question, arrived = item
+            results.append(await _request(graph, question, arrived or time.perf_counter(), stream))
+
+    await asyncio.gather(arrivals(), *(worker() for _ in range(concurrency)))
+    return summarize_load(results, time.perf_counter() - started, concurrency, rate)
+
+
+def summarize_load(results: List[dict], elapsed: float, concurrency: int, rate: float) -> dict:
+    from benchmark.metrics import span_breakdown, summarize
+
+    succeeded = [result for result in results if result["ok"]]
+    errors = Counter(result["error"] for result in results if not result["ok"])
+    traces = [result["spans"] for result in succeeded]
+    report = {
+        "concurrency": concurrency,
+        "offered_rps": rate or None,
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "error_rate": round(sum(errors.values()) / len(results), 4) if results else 0.0,
+        "errors": dict(errors),
+        "unanswered": sum(not result["answered"] for result in succeeded),
+        "degraded": sum(result["degraded"] for result in succeeded),
+        "answer_cache_hits": sum(result["cached"] for result in succeeded),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(succeeded) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(result["latency_ms"] for result in succeeded),
+        "queue_ms": summarize(result["queue_ms"] for result in succeeded),
+        "service_ms": summarize(result["service_ms"] for result in succeeded),
+        "nodes_ms": span_breakdown(traces, kinds={"node"}),
+        "calls_ms": span_breakdown(traces, kinds={"llm", "embedding", "search", "cache"}),
+    }
+    first_tokens = [result["first_token_ms"] for result in succeeded if "first_token_ms" in result]
+    if first_tokens:
+        report["first_token_ms"] = summarize(first_tokens)
+    return report
+
+
+def print_summary(levels: List[dict]) -> None:
+    print(f"{'workers':>7}  {'requests':>8}  {'errors':>6}  {'rps':>8}  {'p50 ms':>9}  {'p99 ms':>9}  {'queue p99':>9}")
+    for level in levels:
+        latency, queue = level["latency_ms"], level["queue_ms"]
+        print(f"{level['concurrency']:>7}  {level['requests']:>8}  {level['error_rate']:>6.1%}  "
+              f"{level['throughput_rps']:>8.2f}  {latency.get('p50', 0):>9.1f}  {latency.get('p99', 0):>9.1f}  "
+              f"{queue.get('p99', 0):>9.1f}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmark.loadgen", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", default=None, help="request log to replay (default: synthetic questions)")
+    parser.add_argument("--concurrency", default="8", help="workers, or a comma-separated sweep such as 1,4,16")
+    parser.add_argument("--count", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (0: closed loop)")
+    parser.add_argument("--duration", type=float, default=0.0, help="stop sending after this many seconds (0: no limit)")
+    parser.add_argument("--stream", action="store_true", help="drive astream_graph and report time to first token")
+    parser.add_argument("--provider", default="standin", choices=("standin", "replay", "record", "auto"))
+    parser.add_argument("--index", default="sandbox", choices=("sandbox", "existing"),
+                        help="sandbox: build a synthetic index first; existing: search the configured index")
+    parser.add_argument("--documents", type=int, default=5_000, help="synthetic corpus size for --index sandbox")
+    parser.add_argument("--llm-latency", type=float, default=None, help="stand-in LLM seconds per call")
+    parser.add_argument("--llm-token-latency", type=float, default=None, help="stand-in LLM seconds per token")
+    parser.add_argument("--embedding-latency", type=float, default=None, help="stand-in embedding seconds per request")
+    parser.add_argument("--workdir", default=None, help="sandbox directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default=None, help="results file or directory (default: storage/benchmarks/)")
+    parser.add_argument("--compare", default=None, help="previous results file to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    questions = None
+    if args.requests is not None:
+        if not os.path.exists(args.requests):
+            raise SystemExit(f"Request log {args.requests} not found")
+        questions = load_questions(args.requests)
+        if not questions:
+            raise SystemExit(f"No questions found in {args.requests}")
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    workdir = sandbox.configure(args.workdir, args.provider, keep_index=args.index == "existing",
+                                llm_latency=args.llm_latency, llm_token_latency=args.llm_token_latency,
+                                embedding_latency=args.embedding_latency)
+
+    # Settings are read on first import of `core`, so the graph is imported only now.
+    from core.multi_graph import create_graph
+    from benchmark.corpus import synthetic_documents, synthetic_questions
+    from benchmark.metrics import compare, environment, print_comparison, run_config, write_results
+    from benchmark.suite import bench_index_build
+
+    try:
+        index_build = None
+        if args.index == "sandbox":
+            index_build = bench_index_build(synthetic_documents(args.documents, seed=args.seed))
+        if questions is None:
+            questions = synthetic_questions(max(args.count, 50), args.seed)
+
+        graph = create_graph()
+        results = {}
+        for concurrency in levels:
+            results[f"concurrency_{concurrency}"] = asyncio.run(run_load(
+                graph, questions, concurrency, args.count, args.rate, args.duration, args.stream, args.seed))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "name": "load",
+        "environment": environment(),
+        "config": {**run_config(args), "questions": len(questions), "index_build": index_build},
+        "results": results,
+    }
+    path = write_results(report, args.output)
+    print_summary(list(results.values()))
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(compare(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
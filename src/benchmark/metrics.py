@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+RESULTS_DIR = "storage/benchmarks"
+
+
+def summarize(values: Iterable[float], digits: int = 3) -> dict:
+    """Count, mean and tail percentiles of a list of measurements."""
+    values = np.asarray(list(values), dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), digits),
+        "p50": round(float(p50), digits),
+        "p90": round(float(p90), digits),
+        "p99": round(float(p99), digits),
+        "max": round(float(values.max()), digits),
+    }
+
+
+def span_breakdown(traces: Iterable[List[dict]], kinds: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """
+    Per-span-name duration summaries (ms) over many traces' span records (see core/tracing.py).
+    A span that occurs several times in one trace, e.g. a node on every iteration, counts each time.
+    """
+    kinds = set(kinds) if kinds is not None else None
+    durations = defaultdict(list)
+    for records in traces:
+        for record in records:
+            if kinds is None or record["kind"] in kinds:
+                durations[record["name"]].append(record["durationMs"])
+    return {name: summarize(values) for name, values in sorted(durations.items())}
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, timeout=30,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def environment() -> dict:
+    """Where and on what the results were measured, so runs can be compared across commits."""
+    import faiss
+
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "measured_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", "unknown"),
+    }
+
+
+def run_config(args: argparse.Namespace) -> dict:
+    """Command-line options plus the settings that shape the measured paths."""
+    from core.config import settings
+
+    return {
+        **{key: value for key, value in vars(args).items() if key not in ("output", "compare", "workdir")},
+        "model_provider": settings.MODEL_PROVIDER,
+        "embedding_dim": settings.STANDIN_EMBEDDING_DIM,
+        "llm_latency": settings.STANDIN_LLM_LATENCY_SECONDS,
+        "llm_token_latency": settings.STANDIN_LLM_TOKEN_LATENCY_SECONDS,
+        "embedding_latency": settings.STANDIN_EMBEDDING_LATENCY_SECONDS,
+        "embedding_cache": settings.EMBEDDING_CACHE_ENABLED,
+        "answer_cache": settings.ANSWER_CACHE_ENABLED,
+        "llm_memo": settings.LLM_MEMO_ENABLED,
+        "router": settings.ROUTER_ENABLED,
+        "rerank_mode": settings.RERANK_MODE,
+        "graph_node_workers": settings.GRAPH_NODE_WORKERS,
+    }
+
+
+def write_results(results: dict, output: Optional[str] = None) -> str:
+    """Write results as JSON. A directory (default storage/benchmarks) gets a timestamped file."""
+    output = output or RESULTS_DIR
+    if not output.endswith(".json"):
+        commit = results.get("environment", {}).get("commit", "")[:8] or "nogit"
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(output, f"{results.get('name', 'benchmark')}_{stamp}_{commit}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    return output
+
+
+def _flatten(data: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict) -> List[dict]:
+    """Metric-by-metric change between two result files' `results` sections."""
+    old = _flatten(baseline.get("results", {}))
+    new = _flatten(current.get("results", {}))
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else None
+        rows.append({"metric": metric, "baseline": old[metric], "current": new[metric],
+                     "change_pct": round(change, 1) if change is not None else None})
+    return rows
+
+
+def print_comparison(rows: List[dict]) -> None:
+    width = max((len(row["metric"]) for row in rows), default=10)
+    print(f"{'metric':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>8}")
+    for row in rows:
+        change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "n/a"
+        print(f"{row['metric']:<{width}}  {row['baseline']:>12.4g}  {row['current']:>12.4g}  {change:>8}")
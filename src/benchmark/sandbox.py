@@ -0,0 +1,60 @@
+import os
+import tempfile
+from typing import Optional
+
+INDEX_PATHS = {
+    "FAISS_INDEX_PATH": "vector_index.faiss",
+    "FAISS_DOCSTORE_PATH": "docstore.sqlite",
+    "FAISS_MANIFEST_PATH": "manifest.json",
+    "FAISS_METADATA_PATH": "metadata.json",
+}
+# Every other file the app writes, relative to the sandbox directory.
+CACHE_PATHS = {
+    "EMBEDDING_CACHE_PATH": "cache/embeddings.sqlite",
+    "ENRICHMENT_CACHE_PATH": "cache/enrichment.sqlite",
+    "LLM_MEMO_PATH": "cache/llm_memo.sqlite",
+    "ROUTER_LOG_PATH": "router/decisions.jsonl",
+}
+
+
+def configure(
+    workdir: Optional[str] = None,
+    provider: Optional[str] = None,
+    keep_index: bool = False,
+    llm_latency: Optional[float] = None,
+    llm_token_latency: Optional[float] = None,
+    embedding_latency: Optional[float] = None,
+) -> str:
+    """
+    Point the app at stand-in providers and a scratch storage directory through the
+    environment. Settings are read when `core` is first imported, so call this before
+    importing anything from `core`. Stand-in latencies given here override the environment;
+    other variables already set in the environment win, except storage paths, which always
+    move into the sandbox so a run never touches the real index and caches. With `keep_index`
+    the configured index is searched (read-only) instead. Returns the sandbox directory.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="lumigo-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    paths = CACHE_PATHS if keep_index else {**INDEX_PATHS, **CACHE_PATHS}
+    for name, path in paths.items():
+        os.environ[name] = os.path.join(workdir, path)
+
+    if provider:
+        os.environ["MODEL_PROVIDER"] = provider
+    os.environ.setdefault("MODEL_PROVIDER", "standin")
+    latencies = {
+        "STANDIN_LLM_LATENCY_SECONDS": llm_latency,
+        "STANDIN_LLM_TOKEN_LATENCY_SECONDS": llm_token_latency,
+        "STANDIN_EMBEDDING_LATENCY_SECONDS": embedding_latency,
+    }
+    for name, seconds in latencies.items():
+        if seconds is not None:
+            os.environ[name] = str(seconds)
+    # Provider quotas are not what is being measured.
+    os.environ.setdefault("INGEST_RATE_LIMIT_PER_SECOND", "0")
+    # Measure the uncached request path; repeated questions would otherwise be answered from cache.
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    # Spans are read in-process from each request's final state.
+    os.environ.setdefault("TRACE_EXPORT_PATH", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    return workdir
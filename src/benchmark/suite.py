@@ -0,0 +1,179 @@
+import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from core.config import settings
+from core.agent_tools import AnswerGenerationTool, DocumentRerankTool, FaissSearchTool
+from core.budget import count_tokens
+from core.build_faiss_index import build_and_save_index
+from core.index_factory import IndexSpec
+from core.index_store import IndexStore
+from core.multi_graph import build_initial_graph_state, create_graph, run_graph
+from core.prompt import REFERENCE_PROMPT
+from core.tracing import start_trace
+from .corpus import synthetic_documents, synthetic_questions
+from .metrics import span_breakdown, summarize
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_index_build(documents: list, index_type: Optional[str] = None) -> dict:
+    """Chunk, embed, index and save `documents`, timing the whole build and its traced stages."""
+    spec = IndexSpec.from_settings()
+    if index_type:
+        spec = spec.model_copy(update={"index_type": index_type})
+
+    with start_trace("benchmark:index_build") as trace:
+        started = time.perf_counter()
+        build_and_save_index(documents, spec, settings.FAISS_INDEX_PATH, settings.FAISS_DOCSTORE_PATH)
+        seconds = time.perf_counter() - started
+
+    with open(settings.FAISS_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    stages = span_breakdown([trace.records()], kinds={"embedding", "index"}) if trace else {}
+    return {
+        "documents": len(documents),
+        "chunks": manifest["ntotal"],
+        "index_type": manifest["index_type"],
+        "seconds": round(seconds, 3),
+        "documents_per_second": round(len(documents) / seconds, 1),
+        "chunks_per_second": round(manifest["ntotal"] / seconds, 1),
+        "stages_ms": {name: summary["mean"] for name, summary in stages.items()},
+    }
+
+
+def bench_metadata_load(repeats: int = 5, fetches: int = 200, k: int = 10) -> dict:
+    """Cold load of the index and document store, then document-row fetches for search hits."""
+    load_ms = []
+    for _ in range(repeats):
+        store = IndexStore(check_interval=float("inf"))
+        started = time.perf_counter()
+        snapshot = store.reload()
+        load_ms.append(_elapsed_ms(started))
+        snapshot.docs.close()
+
+    snapshot = IndexStore(check_interval=float("inf")).reload()
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((fetches, snapshot.index.d)).astype(np.float32)
+    _distances, hits = snapshot.search(queries, k)
+    fetch_ms = []
+    for row in hits:
+        started = time.perf_counter()
+        snapshot.documents([int(vector_id) for vector_id in row if vector_id != -1])
+        fetch_ms.append(_elapsed_ms(started))
+    snapshot.docs.close()
+    return {"vectors": len(snapshot), "load_ms": summarize(load_ms), "fetch_ms": summarize(fetch_ms), "fetch_k": k}
+
+
+def bench_search(questions: List[str], k: int = 10, threads: int = 8) -> dict:
+    """`FaissSearchTool` latency one query at a time, and throughput from `threads` concurrent callers."""
+    tool = FaissSearchTool(store=IndexStore(check_interval=float("inf")))
+    tool._run(questions[:1], k)
+
+    latencies, traces = [], []
+    for question in questions:
+        with start_trace("benchmark:search") as trace:
+            started = time.perf_counter()
+            tool._run([question], k)
+            latencies.append(_elapsed_ms(started))
+        if trace is not None:
+            traces.append(trace.records())
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        started = time.perf_counter()
+        list(pool.map(lambda question: tool._run([question], k), questions))
+        concurrent_seconds = time.perf_counter() - started
+
+    return {
+        "queries": len(questions),
+        "k": k,
+        "vectors": len(tool.store.snapshot()),
+        "latency_ms": summarize(latencies),
+        "qps": round(len(questions) / (sum(latencies) / 1000), 1),
+        "concurrent": {"threads": threads, "qps": round(len(questions) / concurrent_seconds, 1)},
+        "stages_ms": span_breakdown(traces, kinds={"embedding", "search"}),
+    }
+
+
+def bench_prompt_assembly(questions: List[str], doc_counts=(5, 10, 20), repeats: int = 200) -> dict:
+    """Cost of building the answer and rerank prompts from retrieved documents, token counting included."""
+    tool = FaissSearchTool(store=IndexStore(check_interval=float("inf")))
+    pool = tool._run(questions[:10], max(doc_counts))
+    results = {}
+    for count in doc_counts:
+        documents = (pool * (count // max(len(pool), 1) + 1))[:count]
+        answer_us, rerank_us = [], []
+        for i in range(repeats):
+            question = questions[i % len(questions)]
+            started = time.perf_counter()
+            messages = AnswerGenerationTool._messages(question, documents, REFERENCE_PROMPT)
+            prompt_tokens = count_tokens(*(message.content for message in messages))
+            answer_us.append(_elapsed_ms(started) * 1000)
+
+            started = time.perf_counter()
+            count_tokens(DocumentRerankTool._rerank_prompt(question, documents))
+            rerank_us.append(_elapsed_ms(started) * 1000)
+        results[f"{count}_docs"] = {
+            "answer_prompt_us": summarize(answer_us),
+            "answer_prompt_tokens": prompt_tokens,
+            "rerank_prompt_us": summarize(rerank_us),
+        }
+    return results
+
+
+def bench_graph(questions: List[str]) -> dict:
+    """End-to-end `run_graph` latency and per-node, per-call breakdown from the request traces."""
+    graph = create_graph()
+    run_graph(graph, build_initial_graph_state(questions[0]))
+
+    latencies, iterations, traces = [], [], []
+    for question in questions:
+        state = build_initial_graph_state(question)
+        state["queries"] = [question]
+        started = time.perf_counter()
+        final_state = run_graph(graph, state)
+        latencies.append(_elapsed_ms(started))
+        iterations.append(final_state.get("iteration", 0))
+        traces.append(final_state.get("spans", []))
+
+    return {
+        "questions": len(questions),
+        "latency_ms": summarize(latencies),
+        "iterations": summarize(iterations),
+        "nodes_ms": span_breakdown(traces, kinds={"node"}),
+        "calls_ms": span_breakdown(traces, kinds={"llm", "embedding", "search", "tool", "cache"}),
+    }
+
+
+def run_suite(
+    documents: int = 10_000,
+    words_per_doc: int = 200,
+    queries: int = 200,
+    graph_questions: int = 20,
+    k: int = 10,
+    threads: int = 8,
+    index_type: Optional[str] = None,
+    stages=("build", "load", "search", "prompt", "graph"),
+    seed: int = 0,
+) -> dict:
+    """Run the selected benchmark stages; stages after "build" use the index it wrote to the sandbox."""
+    random.seed(seed)
+    questions = synthetic_questions(max(queries, graph_questions), seed)
+    results = {}
+    if "build" in stages:
+        results["index_build"] = bench_index_build(synthetic_documents(documents, words_per_doc, seed), index_type)
+    if "load" in stages:
+        results["metadata_load"] = bench_metadata_load()
+    if "search" in stages:
+        results["search"] = bench_search(questions[:queries], k, threads)
+    if "prompt" in stages:
+        results["prompt_assembly"] = bench_prompt_assembly(questions[:queries])
+    if "graph" in stages:
+        results["graph"] = bench_graph(questions[:graph_questions])
+    return results
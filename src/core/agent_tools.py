@@ -1,18 +1,23 @@
 import re
-import json
-import faiss
+import asyncio
 import numpy as np
-from typing import Literal, TypedDict, List, Dict, Any, Optional
+from collections import Counter
+from typing import Literal, TypedDict, List, Dict, Any, AsyncIterator, Iterator, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
-from langchain_openai import OpenAIEmbeddings
 from logger import logger
 from utils.embedding_utils import format_docs_for_prompt # Assuming this utility exists and is correct
 from .prompt import DECIDE_PROMPT, REFERENCE_PROMPT, RERANK_PROMPT
-from .model import llm, embedding_model
+from .config import settings
+from .model import embedding_model, get_llm
+from .index_store import IndexSnapshot, IndexStore, index_store
+from .llm_memo import llm_memo
+from .reranker import alocal_rerank, local_rerank
+from .tracing import span, traced
+from .budget import count_tokens
 
-MAX_ITERATIONS = 3
+MAX_ITERATIONS = settings.GRAPH_MAX_ITERATIONS
 
 # =========================
 # Tool Input Schemas
@@ -32,6 +37,9 @@ class AnswerGenerationInput(BaseModel):
     reference_docs: List[Dict[str, Any]] = Field(description="Reference documents for citation")
     prompt_template: str = Field(default=REFERENCE_PROMPT, description="Prompt template to use")
 
+class ParentDocumentInput(BaseModel):
+    parent_id: str = Field(description="Id of the publication a retrieved chunk belongs to")
+
 class DecisionInput(BaseModel):
     answer: str = Field(description="Current answer to evaluate")
     iteration: int = Field(description="Current iteration count")
@@ -47,63 +55,151 @@ class FaissSearchTool(BaseTool):
     description: str = Field(default="Search for relevant documents using a local FAISS index.")
     args_schema: type[BaseModel] = FaissSearchInput
 
-    index: Any = Field(default=None, exclude=True)
-    metadata: List[dict] = Field(default_factory=list, exclude=True)
+    store: Any = Field(default=None, exclude=True)
     embeddings: Any = Field(default=None, exclude=True)
 
-    def __init__(self, index_path="storage/vector_index.faiss", metadata_path="storage/metadata.json", **kwargs):
+    def __init__(self, store: Optional[IndexStore] = None, **kwargs):
         super().__init__(**kwargs)
-        try:
-            self.index = faiss.read_index(index_path)
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                self.metadata = json.load(f)
-            self.embeddings = embedding_model
-            logger.info(f"FAISS index and metadata loaded successfully from {index_path}")
-        except Exception as e:
-            logger.error(f"Failed to load FAISS index or metadata: {e}")
-            # Handle initialization failure, maybe raise an error or set a flag
-            self.index = None
+        # Index and metadata live in the process-wide store; the tool only holds a reference.
+        self.store = store or index_store
+        self.embeddings = embedding_model
 
+    @traced("tool:faiss_search", "tool")
     def _run(self, queries: List[str], max_results_per_query: int = 10) -> List[dict]:
-        if self.index is None:
+        snapshot = self.store.snapshot()
+        if snapshot is None:
+            logger.error("FAISS index is not available.")
+            return []
+
+        if not queries:
+            return []
+
+        # Embed every query in a single provider call and search them as one matrix.
+        query_vectors = self.embeddings.get_embeddings_array(queries)
+        return self._search(snapshot, query_vectors, max_results_per_query)
+
+    @traced("tool:faiss_search", "tool")
+    async def _arun(self, queries: List[str], max_results_per_query: int = 10) -> List[dict]:
+        snapshot = await self.store.asnapshot()
+        if snapshot is None:
             logger.error("FAISS index is not available.")
             return []
 
+        if not queries:
+            return []
+
+        query_vectors = await self.embeddings.aget_embeddings_array(queries)
+        # FAISS releases the GIL, so searching in a worker thread keeps the event loop free.
+        return await asyncio.to_thread(self._search, snapshot, query_vectors, max_results_per_query)
+
+    @staticmethod
+    def _search(snapshot: IndexSnapshot, query_vectors: np.ndarray, max_results_per_query: int) -> List[dict]:
+        with span("faiss_search", "search", queries=len(query_vectors), k=max_results_per_query, ntotal=len(snapshot)):
+            _distances, indices = snapshot.search(query_vectors, max_results_per_query)
+
+        # Flatten hits query by query, rank by rank, and keep the first occurrence of each
+        # document so the merged order matches searching the queries one after another.
+        hits = indices.ravel()
+        hits = hits[hits != -1]
+        _unique, first_positions = np.unique(hits, return_index=True)
+        doc_indices = hits[np.sort(first_positions)]
+
+        # Ensure the entire document object is returned, not just content
+        # The metadata already contains page_content and metadata keys.
+        # Chunks of the same publication tend to rank together; keep the best few per publication.
         all_retrieved_docs = []
-        all_retrieved_indices = set()
-
-        for query in queries:
-            query_embedding = self.embeddings.get_embeddings([query])[0]
-            query_vector = np.array([query_embedding], dtype=np.float32)
-            
-            _distances, indices = self.index.search(query_vector, max_results_per_query)
-            
-            for doc_index in indices[0]:
-                if doc_index != -1 and doc_index not in all_retrieved_indices:
-                    all_retrieved_indices.add(doc_index)
-                    retrieved_doc = self.metadata[doc_index]
-                    # Ensure the entire document object is returned, not just content
-                    # The metadata already contains page_content and metadata keys.
-                    all_retrieved_docs.append(retrieved_doc) 
-        
+        chunks_per_parent = Counter()
+        with span("docstore_fetch", "search", hits=len(doc_indices)) as fetch_span:
+            docs = snapshot.documents(doc_indices.tolist())
+            fetch_span.set(documents=len(docs))
+        for doc in docs:
+            parent_id = doc["metadata"].get("parent_id") or doc["vector_id"]
+            if chunks_per_parent[parent_id] < settings.MAX_CHUNKS_PER_PARENT:
+                chunks_per_parent[parent_id] += 1
+                all_retrieved_docs.append(doc)
+
         logger.info(f"FAISS search found {len(all_retrieved_docs)} unique documents.")
         return all_retrieved_docs
 
 
+class ParentDocumentTool(BaseTool):
+    name: str = Field(default="parent_document")
+    description: str = Field(default="Fetch the full publication that a retrieved chunk was cut from.")
+    args_schema: type[BaseModel] = ParentDocumentInput
+
+    store: Any = Field(default=None, exclude=True)
+
+    def __init__(self, store: Optional[IndexStore] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store or index_store
+
+    def _run(self, parent_id: str) -> Dict[str, Any]:
+        snapshot = self.store.snapshot()
+        parent = snapshot.parent(parent_id) if snapshot is not None else None
+        if parent is None:
+            logger.warning(f"[ParentDocumentTool] Parent document {parent_id} not found")
+            return {}
+        return parent
+
+    async def _arun(self, parent_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._run, parent_id)
+
+
 class DocumentRerankTool(BaseTool):
     name: str = Field(default="document_rerank")
-    description: str = Field(default="Rerank documents based on query relevance using LLM")
+    description: str = Field(default="Rerank documents based on query relevance")
     args_schema: type[BaseModel] = DocumentRerankInput
 
+    store: Any = Field(default=None, exclude=True)
+    mode: str = Field(default="local", exclude=True)
+
+    def __init__(self, store: Optional[IndexStore] = None, mode: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store or index_store
+        self.mode = mode or settings.RERANK_MODE
+
+    @traced("tool:document_rerank", "tool")
     def _run(self, query: str, documents: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
-        logger.info(f"[DocumentRerankTool] Reranking {len(documents)} documents for query: {query[:50]}...")
+        logger.info(f"[DocumentRerankTool] Reranking {len(documents)} documents ({self.mode}) for query: {query[:50]}...")
         if not documents:
             return []
 
-        formatted = "\n\n".join(f"[{i+1}] {doc.get('summary', doc.get('page_content', '')[:200])}" for i, doc in enumerate(documents))
-        prompt = RERANK_PROMPT.format(query=query, formatted_docs=formatted)
-        response = llm.invoke([HumanMessage(content=prompt)]).content.strip()
+        if self.mode in ("local", "cross_encoder"):
+            top_docs = local_rerank(query, documents, top_k, self.store.snapshot(),
+                                    use_cross_encoder=self.mode == "cross_encoder")
+            logger.info(f"[DocumentRerankTool] Selected {len(top_docs)} documents locally")
+            return top_docs
+
+        prompt = self._rerank_prompt(query, documents)
+        response = llm_memo.invoke([HumanMessage(content=prompt)], namespace="rerank").strip()
+        return self._select(response, documents, top_k)
+
+    @traced("tool:document_rerank", "tool")
+    async def _arun(self, query: str, documents: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
+        logger.info(f"[DocumentRerankTool] Reranking {len(documents)} documents ({self.mode}) for query: {query[:50]}...")
+        if not documents:
+            return []
 
+        if self.mode in ("local", "cross_encoder"):
+            top_docs = await alocal_rerank(query, documents, top_k, await self.store.asnapshot(),
+                                           use_cross_encoder=self.mode == "cross_encoder")
+            logger.info(f"[DocumentRerankTool] Selected {len(top_docs)} documents locally")
+            return top_docs
+
+        prompt = self._rerank_prompt(query, documents)
+        response = (await llm_memo.ainvoke([HumanMessage(content=prompt)], namespace="rerank")).strip()
+        return self._select(response, documents, top_k)
+
+    @staticmethod
+    def _rerank_prompt(query: str, documents: List[Dict[str, Any]]) -> str:
+        formatted = "\n\n".join(
+            f"[{i+1}] {doc.get('metadata', {}).get('summary') or doc.get('page_content', '')[:200]}"
+            for i, doc in enumerate(documents)
+        )
+        return RERANK_PROMPT.format(query=query, formatted_docs=formatted)
+
+    @staticmethod
+    def _select(response: str, documents: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
         indices = [int(i) for i in re.findall(r"\d+", response) if 1 <= int(i) <= len(documents)]
 
         if indices:
@@ -115,9 +211,6 @@ class DocumentRerankTool(BaseTool):
 
         return top_docs
 
-    async def _arun(self, query: str, documents: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
-        return self._run(query, documents, top_k)
-
 
 class AnswerGenerationTool(BaseTool):
     name: str = Field(default="answer_generation")
@@ -127,17 +220,62 @@ class AnswerGenerationTool(BaseTool):
     def _run(self, query: str, reference_docs: List[Dict[str, Any]], prompt_template: str = REFERENCE_PROMPT) -> str:
         logger.info(f"[AnswerGenerationTool] Generating answer for query: {query[:50]}...")
 
+        messages = self._messages(query, reference_docs, prompt_template)
+        with span("llm:answer_generation", "llm", documents=len(reference_docs)) as llm_span:
+            cited_answer = get_llm().invoke(messages).content
+            self._count(llm_span, messages, cited_answer)
+        logger.info(f"[AnswerGenerationTool] Generated answer with {len(reference_docs)} references")
+        return cited_answer
+
+    def stream(self, query: str, reference_docs: List[Dict[str, Any]], prompt_template: str = REFERENCE_PROMPT) -> Iterator[str]:
+        """Yield the cited answer token chunk by token chunk as the LLM produces it."""
+        logger.info(f"[AnswerGenerationTool] Streaming answer for query: {query[:50]}...")
+        messages = self._messages(query, reference_docs, prompt_template)
+        chunks = []
+        with span("llm:answer_generation", "llm", documents=len(reference_docs), streamed=True) as llm_span:
+            for chunk in get_llm().stream(messages):
+                if chunk.content:
+                    if not chunks:
+                        llm_span.set(first_token_ms=round(llm_span.duration_ms, 3))
+                    chunks.append(chunk.content)
+                    yield chunk.content
+            self._count(llm_span, messages, "".join(chunks))
+
+    @staticmethod
+    def _count(llm_span: Any, messages: List[BaseMessage], answer: str) -> None:
+        llm_span.set(input_tokens=count_tokens(*(message.content for message in messages)),
+                     output_tokens=count_tokens(answer))
+
+    @staticmethod
+    def _messages(query: str, reference_docs: List[Dict[str, Any]], prompt_template: str) -> List[BaseMessage]:
         formatted_docs = format_docs_for_prompt(reference_docs)
-        messages = [
+        return [
             SystemMessage(content=prompt_template),
             HumanMessage(content=f"Reference:\n{formatted_docs}\n\nQuestion: {query}")
         ]
-        cited_answer = llm.invoke(messages).content
+
+    async def _arun(self, query: str, reference_docs: List[Dict[str, Any]], prompt_template: str = REFERENCE_PROMPT) -> str:
+        logger.info(f"[AnswerGenerationTool] Generating answer for query: {query[:50]}...")
+        messages = self._messages(query, reference_docs, prompt_template)
+        with span("llm:answer_generation", "llm", documents=len(reference_docs)) as llm_span:
+            cited_answer = (await get_llm().ainvoke(messages)).content
+            self._count(llm_span, messages, cited_answer)
         logger.info(f"[AnswerGenerationTool] Generated answer with {len(reference_docs)} references")
         return cited_answer
 
-    async def _arun(self, query: str, reference_docs: List[Dict[str, Any]], prompt_template: str = REFERENCE_PROMPT) -> str:
-        return self._run(query, reference_docs, prompt_template)
+    async def astream(self, query: str, reference_docs: List[Dict[str, Any]], prompt_template: str = REFERENCE_PROMPT) -> AsyncIterator[str]:
+        """Async `stream`."""
+        logger.info(f"[AnswerGenerationTool] Streaming answer for query: {query[:50]}...")
+        messages = self._messages(query, reference_docs, prompt_template)
+        chunks = []
+        with span("llm:answer_generation", "llm", documents=len(reference_docs), streamed=True) as llm_span:
+            async for chunk in get_llm().astream(messages):
+                if chunk.content:
+                    if not chunks:
+                        llm_span.set(first_token_ms=round(llm_span.duration_ms, 3))
+                    chunks.append(chunk.content)
+                    yield chunk.content
+            self._count(llm_span, messages, "".join(chunks))
 
 
 class DecisionTool(BaseTool):
@@ -145,18 +283,39 @@ class DecisionTool(BaseTool):
     description: str = Field(default="Make decisions about whether to continue or end the workflow")
     args_schema: type[BaseModel] = DecisionInput
 
+    @traced("tool:decision_maker", "tool")
     def _run(self, answer: str, iteration: int, max_iterations: int = MAX_ITERATIONS, decision_prompt: str = DECIDE_PROMPT) -> Dict[str, Any]:
         logger.info(f"[DecisionTool] Making decision at iteration {iteration}/{max_iterations}")
 
         if iteration >= max_iterations:
-            return {
-                "continue": False,
-                "reason": "max_iterations_reached",
-                "next_action": "end"
-            }
+            return self._max_iterations_reached()
+
+        prompt = decision_prompt.format(last_reply=answer)
+        decision = llm_memo.invoke([HumanMessage(content=prompt)], namespace="decide_next_step")
+        return self._decision(decision)
+
+    @traced("tool:decision_maker", "tool")
+    async def _arun(self, answer: str, iteration: int, max_iterations: int = MAX_ITERATIONS, decision_prompt: str = DECIDE_PROMPT) -> Dict[str, Any]:
+        logger.info(f"[DecisionTool] Making decision at iteration {iteration}/{max_iterations}")
+
+        if iteration >= max_iterations:
+            return self._max_iterations_reached()
 
         prompt = decision_prompt.format(last_reply=answer)
-        decision = llm.invoke([HumanMessage(content=prompt)]).content.strip().upper()
+        decision = await llm_memo.ainvoke([HumanMessage(content=prompt)], namespace="decide_next_step")
+        return self._decision(decision)
+
+    @staticmethod
+    def _max_iterations_reached() -> Dict[str, Any]:
+        return {
+            "continue": False,
+            "reason": "max_iterations_reached",
+            "next_action": "end"
+        }
+
+    @staticmethod
+    def _decision(reply: str) -> Dict[str, Any]:
+        decision = reply.strip().upper()
         continue_workflow = "YES" in decision
 
         return {
@@ -166,9 +325,6 @@ class DecisionTool(BaseTool):
             "next_action": "expand" if continue_workflow else "end"
         }
 
-    async def _arun(self, answer: str, iteration: int, max_iterations: int = MAX_ITERATIONS, decision_prompt: str = DECIDE_PROMPT) -> Dict[str, Any]:
-        return self._run(answer, iteration, max_iterations, decision_prompt)
-
 
 # =========================
 # Tool Registry
@@ -184,6 +340,7 @@ class AgentToolRegistry:
     def _initialize_tools(self):
         tools = [
             FaissSearchTool(),
+            ParentDocumentTool(),
             DocumentRerankTool(),
             AnswerGenerationTool(),
             DecisionTool()
@@ -196,3 +353,8 @@ class AgentToolRegistry:
 
     def list_tools(self) -> List[str]:
         return list(self.tools.keys())
+
+
+# Tools only hold references to the process-wide index store and models, so one
+# registry serves every node call and every concurrent request.
+tool_registry = AgentToolRegistry()
@@ -0,0 +1,101 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from logger import logger
+from .config import settings
+from .index_store import IndexStore, index_store
+
+
+class SemanticAnswerCache:
+    """
+    Process-wide cache of graph results keyed by question embedding.
+
+    A question is a hit when its cosine similarity to a cached question is at
+    least `threshold` and the cached answer was produced against the current
+    index version. Entries expire after `ttl` seconds and the least recently
+    used ones are evicted beyond `max_entries`. Entries from an older index
+    version are dropped as soon as a new index is noticed.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl: float = settings.ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        store: Optional[IndexStore] = None,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store or index_store
+        self.hits = 0
+        self.misses = 0
+        # key -> (unit query vector, index version, created at, cached value)
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Any, float, dict]]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _prune(self, version: Any, now: float) -> None:
+        stale = [
+            key for key, (_, entry_version, created, _) in self._entries.items()
+            if entry_version != version or now - created > self.ttl
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    def version(self) -> Any:
+        """The current index version, to look up and later store an answer under."""
+        return self.store.version
+
+    async def aversion(self) -> Any:
+        """Async `version`; the reload check behind it may read a new index, so not on the event loop."""
+        snapshot = await self.store.asnapshot()
+        return snapshot.version if snapshot is not None else None
+
+    def get(self, query_vector: np.ndarray, version: Any) -> Optional[dict]:
+        """Return the cached value for the most similar question above the threshold, if any."""
+        query = self._normalize(query_vector)
+        with self._lock:
+            self._prune(version, time.time())
+            best_key, best_score = None, self.threshold
+            for key, (vector, _, _, _) in self._entries.items():
+                if vector.shape != query.shape:
+                    continue
+                score = float(vector @ query)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            logger.info(f"[AnswerCache] Hit with similarity {best_score:.3f}")
+            return self._entries[best_key][3]
+
+    def set(self, query_vector: np.ndarray, value: dict, version: Any) -> None:
+        """Cache `value` under the index `version` it was answered from."""
+        with self._lock:
+            self._entries[self._next_key] = (self._normalize(query_vector), version, time.time(), value)
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+answer_cache = SemanticAnswerCache()
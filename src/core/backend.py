@@ -1,7 +1,25 @@
 import re
 import streamlit as st
 from core.multi_graph import create_graph
-from core.build_faiss_index import run_indexing_pipeline
+from core.index_store import IndexStore, index_store
+from core.answer_cache import answer_cache
+
+
+@st.cache_resource(show_spinner=False)
+def get_graph():
+    """The compiled agent graph, built once per server process and shared by every session."""
+    return create_graph()
+
+
+@st.cache_resource(show_spinner="Loading the FAISS index...")
+def get_index_store() -> IndexStore:
+    """
+    The process-wide index store with its snapshot loaded. The tool registry and model
+    clients are module-level objects of core, so they are shared the same way.
+    """
+    index_store.snapshot()
+    return index_store
+
 
 def submit_query():
     if st.session_state.user_input.strip():
@@ -31,6 +49,14 @@ def extract_followups(response: str):
 
 def trigger_build_index():
     """Wrapper to run the FAISS index building pipeline and show progress in Streamlit."""
+    # The indexing pipeline (PDF parsing, tokenizer, enrichment) is only imported when it runs.
+    from core.build_faiss_index import run_indexing_pipeline
+
     with st.spinner("Building FAISS index from source documents... Please wait."):
         run_indexing_pipeline()
+        # Every session shares the cached resources, so drop them for the next run to pick up the new index.
+        get_graph.clear()
+        get_index_store.clear()
+        index_store.reload()
+        answer_cache.clear()
     st.success("✅ FAISS index has been successfully built!")
@@ -0,0 +1,212 @@
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional
+
+import tiktoken
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.constants import CONF, CONFIG_KEY_STREAM_WRITER
+
+from logger import logger
+from .config import settings
+from .tracing import span
+
+# Sync nodes run here so that a hung provider call can be abandoned at its timeout.
+_node_executor = ThreadPoolExecutor(max_workers=settings.GRAPH_NODE_WORKERS, thread_name_prefix="graph-node")
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(*texts: str) -> int:
+    """cl100k token count of the given texts, used to charge the request's token budget."""
+    return sum(len(_encoding().encode(text or "", disallowed_special=())) for text in texts)
+
+
+class _TokenMeter:
+    def __init__(self):
+        self.total = 0
+
+
+# Tokens spent by the provider calls of the node running in this context.
+_node_tokens: contextvars.ContextVar[Optional[_TokenMeter]] = contextvars.ContextVar("node_tokens", default=None)
+
+
+def charge_tokens(count: int) -> None:
+    """Charge provider tokens to the running node; `budgeted_node` adds them to the request's budget."""
+    meter = _node_tokens.get()
+    if meter is not None:
+        meter.total += count
+
+
+class _Partial:
+    def __init__(self):
+        self.value = None
+
+
+# Work the node running in this context has produced so far, for its timeout fallback.
+_node_partial: contextvars.ContextVar[Optional[_Partial]] = contextvars.ContextVar("node_partial", default=None)
+
+
+def keep_partial(value: Any) -> None:
+    """
+    Hand the running node's work so far (e.g. the answer chunks streamed until now) to
+    `budgeted_node`, which passes it to the node's `partial_fallback` if the node times out.
+    """
+    partial = _node_partial.get()
+    if partial is not None:
+        partial.value = value
+
+
+def _charged(result: Any, meter: _TokenMeter) -> Any:
+    # Conditional edges cannot update the state, so only node updates carry the charge.
+    if isinstance(result, dict) and meter.total:
+        return {**result, "tokens_used": result.get("tokens_used", 0) + meter.total}
+    return result
+
+
+def start_budget(state: dict, deadline_seconds: float = settings.GRAPH_DEADLINE_SECONDS) -> dict:
+    """Stamp the request's wall-clock deadline on the state, unless the caller already set one."""
+    if not state.get("deadline") and deadline_seconds > 0:
+        state["deadline"] = time.time() + deadline_seconds
+    return state
+
+
+def remaining_seconds(state: dict) -> float:
+    deadline = state.get("deadline") or 0
+    return deadline - time.time() if deadline else float("inf")
+
+
+def budget_exhausted(state: dict) -> Optional[str]:
+    """Why the request must stop now ("deadline" or "token_budget"), or None while within budget."""
+    if remaining_seconds(state) <= 0:
+        return "deadline"
+    if settings.GRAPH_TOKEN_BUDGET > 0 and state.get("tokens_used", 0) >= settings.GRAPH_TOKEN_BUDGET:
+        return "token_budget"
+    return None
+
+
+def node_timeout(state: dict) -> float:
+    return max(0.0, min(settings.GRAPH_NODE_TIMEOUT_SECONDS, remaining_seconds(state)))
+
+
+def _describe(node_span: Any, result: Any) -> Any:
+    """Record the size of a node's state update on its span."""
+    if isinstance(result, dict):
+        for key in ("retrieved_docs", "prefetched_docs", "queries"):
+            if key in result:
+                node_span.set(**{key: len(result[key])})
+        if "tokens_used" in result:
+            node_span.set(tokens=result["tokens_used"])
+    else:
+        node_span.set(decision=str(result))
+    return result
+
+
+def _isolated(state: dict) -> dict:
+    """Copy of the state with its own logs and trace, for a node that may outlive its timeout."""
+    copy = dict(state)
+    copy["logs"] = {key: list(entries) for key, entries in state.get("logs", {}).items()}
+    copy["trace"] = list(state.get("trace", []))
+    return copy
+
+
+def _merge_back(state: dict, copy: dict, original: dict) -> None:
+    """Append the log and trace entries a node added to its copy; `original` holds the lengths it started from."""
+    logs = state.setdefault("logs", {})
+    for key, entries in copy["logs"].items():
+        logs.setdefault(key, []).extend(entries[original["logs"].get(key, 0):])
+    state.setdefault("trace", []).extend(copy["trace"][original["trace"]:])
+
+
+def _worker_context(muted: threading.Event) -> contextvars.Context:
+    """
+    The caller's context (graph config, trace) for a node run in the executor, with a stream
+    writer that goes quiet once `muted` is set, so an abandoned node stops streaming tokens.
+    """
+    context = contextvars.copy_context()
+    config = context.get(var_child_runnable_config, None)
+    writer = (config or {}).get(CONF, {}).get(CONFIG_KEY_STREAM_WRITER)
+    if writer is not None:
+        def gated_writer(chunk: Any) -> None:
+            if not muted.is_set():
+                writer(chunk)
+
+        gated_config = {**config, CONF: {**config[CONF], CONFIG_KEY_STREAM_WRITER: gated_writer}}
+        context.run(var_child_runnable_config.set, gated_config)
+    return context
+
+
+def budgeted_node(name: str, func: Callable[[dict], Any], afunc: Callable[[dict], Awaitable[Any]],
+                  fallback: Callable[[dict], Any],
+                  partial_fallback: Optional[Callable[[dict, Any], Any]] = None) -> RunnableLambda:
+    """
+    Wrap a graph node (or conditional edge) so it gives up after the per-node timeout or the
+    request deadline, whichever comes first, and returns `fallback(state)` instead, or
+    `partial_fallback(state, partial)` if the node handed over work with `keep_partial`.
+    Fallbacks keep the best answer produced so far rather than failing the request.
+    """
+    def timed_out(state: dict, node_span: Any, meter: _TokenMeter, partial: _Partial) -> Any:
+        logger.warning(f"[Budget] {name} exceeded its time budget, using fallback")
+        state.setdefault("logs", {}).setdefault("budget", []).append(f"{name} timed out")
+        node_span.set(timed_out=True)
+        if partial_fallback is not None and partial.value is not None:
+            result = partial_fallback(state, partial.value)
+        else:
+            result = fallback(state)
+        # Calls that completed before the timeout were still paid for.
+        return _describe(node_span, _charged(result, meter))
+
+    def run(state: dict) -> Any:
+        with span(name, "node", iteration=state.get("iteration", 0)) as node_span:
+            meter = _TokenMeter()
+            partial = _Partial()
+            timeout = node_timeout(state)
+            if timeout <= 0:
+                return timed_out(state, node_span, meter, partial)
+            # The node works on its own copy of the logs and trace and a writer that can be muted,
+            # so once it is abandoned it can no longer touch the request it timed out of.
+            muted = threading.Event()
+            private = _isolated(state)
+            original = {"logs": {key: len(entries) for key, entries in private["logs"].items()},
+                        "trace": len(private["trace"])}
+            context = _worker_context(muted)
+            context.run(_node_tokens.set, meter)
+            context.run(_node_partial.set, partial)
+            future = _node_executor.submit(context.run, func, private)
+            try:
+                result = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                # A node still queued never starts; a running one finishes unseen and is discarded.
+                muted.set()
+                future.cancel()
+                return timed_out(state, node_span, meter, partial)
+            _merge_back(state, private, original)
+            return _describe(node_span, _charged(result, meter))
+
+    async def arun(state: dict) -> Any:
+        with span(name, "node", iteration=state.get("iteration", 0)) as node_span:
+            meter = _TokenMeter()
+            partial = _Partial()
+            timeout = node_timeout(state)
+            if timeout <= 0:
+                return timed_out(state, node_span, meter, partial)
+            # The node's task copies this context, so its calls charge `meter` and report to `partial`.
+            token = _node_tokens.set(meter)
+            partial_token = _node_partial.set(partial)
+            try:
+                result = await asyncio.wait_for(afunc(state), timeout=timeout)
+            except asyncio.TimeoutError:
+                return timed_out(state, node_span, meter, partial)
+            finally:
+                _node_partial.reset(partial_token)
+                _node_tokens.reset(token)
+            return _describe(node_span, _charged(result, meter))
+
+    return RunnableLambda(run, afunc=arun, name=name)
@@ -1,104 +1,353 @@
 import faiss
 import json
+import hashlib
 import numpy as np
 import os
 import asyncio
 import tiktoken
+from datetime import datetime, timezone
 from langchain.docstore.document import Document
 
+from logger import logger
+from .config import settings
+from .doc_store import DocumentStore
+from .index_factory import IndexSpec, create_index, train_index
 from .model import embedding_model
-from utils.data_utils import load_and_process_json_async
+from .tracing import start_trace, traced
+from utils.data_utils import chunk_text_by_tokens, process_publications_async
+from utils.ingest_scheduler import IngestionScheduler
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 
-def load_source_documents():
-    """
-    Loads and processes source JSON documents from the data directory.
-    This should return a list of LangChain Document objects.
-    """
-    print("Loading source documents...")
-    
-    async def process_all_files():
-        tasks = []
-        for filename in os.listdir(DATA_DIR):
-            if filename.endswith(".json"):
-                file_path = os.path.join(DATA_DIR, filename)
-                tasks.append(load_and_process_json_async(file_path))
-        
-        processed_docs_list = await asyncio.gather(*tasks)
-        
-        all_docs = [doc for sublist in processed_docs_list for doc in sublist]
-        # Create Document objects while preserving all metadata
-        return [Document(page_content=doc.get('content', ''), 
-                         metadata={'source': doc.get('title', 'N/A'), 
-                                   'summary': doc.get('summary', ''), 
-                                   'tags': doc.get('tags', [])}) for doc in all_docs]
-
-    processed_documents = asyncio.run(process_all_files())
-    print(f"Loaded and processed {len(processed_documents)} documents.")
+
+def publication_id(pub: dict) -> str:
+    """Stable identifier of a publication: its `id` field, or a hash of its title."""
+    if pub.get("id"):
+        return str(pub["id"])
+    return "title:" + hashlib.sha1(pub.get("title", "").encode("utf-8")).hexdigest()
+
+
+def publication_hash(title: str, content: str) -> str:
+    """Hash of the fields that feed a publication's indexed content."""
+    return hashlib.sha256(f"{title}\0{content}".encode("utf-8")).hexdigest()
+
+
+def vector_id(doc_id: str) -> int:
+    """Map a document id to a stable, non-negative int64 FAISS vector id."""
+    digest = hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def load_source_publications() -> list[dict]:
+    """
+    Reads the raw publication records from every JSON file in the data directory.
+    Publications sharing an id are collapsed, the last one wins.
+    """
+    publications = {}
+    for filename in sorted(os.listdir(DATA_DIR)):
+        if filename.endswith(".json"):
+            with open(os.path.join(DATA_DIR, filename), 'r', encoding='utf-8') as f:
+                for pub in json.load(f):
+                    publications[publication_id(pub)] = pub
+    return list(publications.values())
+
+
+def load_source_documents(publications: list[dict] = None):
+    """
+    Processes source publications (all of them by default) into LangChain Documents.
+    Each Document carries the publication's stable id and content hash in its metadata.
+    """
+    logger.info("[Indexer] Loading source documents...")
+    if publications is None:
+        publications = load_source_publications()
+
+    processed = asyncio.run(process_publications_async(publications))
+    # Create Document objects while preserving all metadata
+    processed_documents = [
+        Document(page_content=doc.get('content', ''),
+                 metadata={'id': doc.get('doc_id') or publication_id(doc),
+                           'content_hash': publication_hash(doc.get('title', ''), doc.get('content', '')),
+                           'source': doc.get('title', 'N/A'),
+                           'summary': doc.get('summary', ''),
+                           'tags': doc.get('tags', [])}) for doc in processed
+    ]
+    logger.info(f"[Indexer] Loaded and processed {len(processed_documents)} documents.")
     return processed_documents
 
-def build_and_save_index(docs: list[Document], index_path="storage/vector_index.faiss", metadata_path="storage/metadata.json"):
+
+def diff_publications(publications: list[dict], indexed: dict[str, str]) -> tuple[list[dict], set[str]]:
     """
-    Builds a FAISS index from documents and saves it to disk.
+    Compares source publications against the content hashes of the current index.
+    Returns the publications that are new or changed, and the ids that are no longer present.
     """
-    # Ensure the storage directory exists
-    storage_dir = os.path.dirname(index_path)
-    os.makedirs(storage_dir, exist_ok=True)
+    current = {publication_id(pub): pub for pub in publications}
+
+    to_process = [
+        pub for doc_id, pub in current.items()
+        if indexed.get(doc_id) != publication_hash(pub.get("title", ""), pub.get("publication_description", ""))
+    ]
+    removed = set(indexed) - set(current)
+    return to_process, removed
+
 
-    print("Initializing embeddings model...")
-    print("Generating embeddings for documents...")
-    
+def embedding_text(doc: Document) -> str:
+    """
+    The text that is embedded for a chunk, built from settings.INDEX_EMBEDDING_FIELDS.
+    "page_content" is the chunk text; any other field is read from the chunk metadata.
+    Nothing else (e.g. summaries produced during ingestion) is embedded.
+    """
+    parts = []
+    for field in settings.INDEX_EMBEDDING_FIELDS:
+        value = doc.page_content if field == "page_content" else doc.metadata.get(field, "")
+        if isinstance(value, list):
+            value = ", ".join(value)
+        if value:
+            parts.append(str(value))
+    return "\n".join(parts)
+
+
+@traced("index:embed_documents", "embedding")
+def embed_documents(docs: list[Document]) -> np.ndarray:
+    """
+    Embeds each document exactly once, in token-bounded batches that run concurrently
+    under the ingestion scheduler, and returns a float32 matrix in document order.
+    """
     # Using tiktoken for token counting. This is a reasonable default.
     # If using a different model family, you might need a different tokenizer.
     tokenizer = tiktoken.get_encoding("cl100k_base")
     max_tokens_per_batch = 18000  # Keep it safely below the 20000 limit
-    all_embeddings = []
-    
+    max_texts_per_batch = 250  # Vertex AI accepts at most 250 texts per request
+    batches = []
+
     current_batch = []
     current_token_count = 0
 
-    for doc in docs:
-        doc_token_count = len(tokenizer.encode(doc.page_content))
-        if current_token_count + doc_token_count > max_tokens_per_batch and current_batch:
-            print(f"Processing batch with {len(current_batch)} documents and {current_token_count} tokens...")
-            batch_embeddings = embedding_model.get_embeddings([d.page_content for d in current_batch])
-            all_embeddings.extend(batch_embeddings)
+    for text in (embedding_text(doc) for doc in docs):
+        text_token_count = len(tokenizer.encode(text, disallowed_special=()))
+        batch_full = (current_token_count + text_token_count > max_tokens_per_batch
+                      or len(current_batch) >= max_texts_per_batch)
+        if batch_full and current_batch:
+            batches.append(current_batch)
             current_batch = []
             current_token_count = 0
-        
-        current_batch.append(doc)
-        current_token_count += doc_token_count
 
-    # Process the last remaining batch
+        current_batch.append(text)
+        current_token_count += text_token_count
+
+    # Keep the last remaining batch
     if current_batch:
-        print(f"Processing final batch with {len(current_batch)} documents and {current_token_count} tokens...")
-        batch_embeddings = embedding_model.get_embeddings([d.page_content for d in current_batch])
-        all_embeddings.extend(batch_embeddings)
-    
-    doc_embeddings = all_embeddings
-    
-    embedding_dim = len(doc_embeddings[0])
-    
-    print(f"Creating FAISS index with dimension {embedding_dim}...")
-    index = faiss.IndexFlatL2(embedding_dim)
-    index.add(np.array(doc_embeddings, dtype=np.float32))
-    
-    print(f"Saving FAISS index to {index_path}...")
-    faiss.write_index(index, index_path)
-    
-    # Save document metadata for later retrieval
-    metadata = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
-    print(f"Saving metadata to {metadata_path}...")
-    with open(metadata_path, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=4)
-
-    print("Index building complete.")
-
-def run_indexing_pipeline():
-    """Main function to run the full indexing pipeline."""
-    documents = load_source_documents()
-    build_and_save_index(documents)
+        batches.append(current_batch)
+
+    async def embed_batches():
+        scheduler = IngestionScheduler()
+        return await asyncio.gather(
+            *(scheduler.run_blocking(embedding_model.get_embeddings_array, batch) for batch in batches)
+        )
+
+    logger.info(f"[Indexer] Embedding {len(docs)} documents in {len(batches)} batches...")
+    embeddings = np.vstack(asyncio.run(embed_batches()))
+    logger.info(f"[Indexer] Embedding cache stats: {embedding_model.cache_stats()}")
+    return embeddings
+
+
+def embedding_config() -> dict:
+    return {"model": embedding_model.model_name, "fields": list(settings.INDEX_EMBEDDING_FIELDS)}
+
+
+@traced("index:chunk_documents", "index")
+def chunk_documents(docs: list[Document]) -> list[Document]:
+    """
+    Splits each publication into token-bounded chunks. Every chunk keeps the
+    publication's metadata and points back to it through `parent_id`.
+    """
+    chunks = []
+    for doc in docs:
+        parent_id = doc.metadata["id"]
+        texts = chunk_text_by_tokens(doc.page_content, settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+        for chunk_index, text in enumerate(texts):
+            chunks.append(Document(
+                page_content=text,
+                metadata={**doc.metadata, 'id': f"{parent_id}#{chunk_index}",
+                          'parent_id': parent_id, 'chunk_index': chunk_index},
+            ))
+    return chunks
+
+
+def to_document_row(doc: Document) -> dict:
+    return {"vector_id": vector_id(doc.metadata["id"]), "page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def chunking_config() -> dict:
+    return {"chunk_size": settings.CHUNK_SIZE_TOKENS, "chunk_overlap": settings.CHUNK_OVERLAP_TOKENS}
+
+
+def _write_index_files(index, spec: IndexSpec, index_path: str, manifest_path: str):
+    """Writes the index and a manifest describing it to temporary files next to their targets."""
+    logger.info(f"[Indexer] Saving FAISS index to {index_path}...")
+    faiss.write_index(index, index_path + ".tmp")
+
+    # The search side reads the index family and its runtime parameters
+    # (nprobe, efSearch) from the manifest.
+    manifest = {
+        "index_type": spec.index_type,
+        "spec": spec.model_dump(),
+        "chunking": chunking_config(),
+        "embedding": embedding_config(),
+        "dim": index.d,
+        "ntotal": index.ntotal,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+
+
+@traced("index:save", "index")
+def save_index(index, rows: list[dict], parents: list[dict], spec: IndexSpec, index_path: str, docstore_path: str,
+               manifest_path: str = settings.FAISS_MANIFEST_PATH):
+    """Writes a freshly built index, its document store and manifest to disk."""
+    # Write to temporary files and swap them in, so that a running app
+    # (see core/index_store.py) never picks up a half-written index.
+    logger.info(f"[Indexer] Saving {len(rows)} chunks of {len(parents)} documents to {docstore_path}...")
+    if os.path.exists(docstore_path + ".tmp"):
+        os.remove(docstore_path + ".tmp")
+    staging = DocumentStore(docstore_path + ".tmp")
+    staging.upsert(rows)
+    staging.upsert_parents(parents)
+    staging.close()
+
+    _write_index_files(index, spec, index_path, manifest_path)
+
+    # The manifest goes last: the app reloads once it changes.
+    os.replace(docstore_path + ".tmp", docstore_path)
+    os.replace(index_path + ".tmp", index_path)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def build_and_save_index(docs: list[Document], index_spec: IndexSpec = None,
+                         index_path=settings.FAISS_INDEX_PATH, docstore_path=settings.FAISS_DOCSTORE_PATH):
+    """
+    Builds a FAISS index from documents and saves it, with a document store, to disk.
+    Documents are split into chunks; each chunk vector is stored under a stable id
+    derived from its document's `id` metadata and the chunk position.
+    The index family comes from `index_spec` (default: settings), with "auto"
+    choosing one from the corpus size.
+    """
+    # Ensure the storage directory exists
+    storage_dir = os.path.dirname(index_path)
+    os.makedirs(storage_dir, exist_ok=True)
+
+    chunks = chunk_documents(docs)
+    logger.info(f"[Indexer] Generating embeddings for {len(chunks)} chunks of {len(docs)} documents...")
+    chunk_embeddings = embed_documents(chunks)
+    embedding_dim = chunk_embeddings.shape[1]
+
+    spec = (index_spec or IndexSpec.from_settings()).resolve(len(chunks), embedding_dim)
+    logger.info(f"[Indexer] Creating FAISS {spec.index_type} index with dimension {embedding_dim}...")
+    index = create_index(spec, embedding_dim)
+    train_index(index, chunk_embeddings)
+    rows = [to_document_row(chunk) for chunk in chunks]
+    index.add_with_ids(chunk_embeddings, np.array([row["vector_id"] for row in rows], dtype=np.int64))
+
+    parents = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+    save_index(index, rows, parents, spec, index_path, docstore_path)
+    logger.info("[Indexer] Index building complete.")
+
+
+def load_existing_index(index_path=settings.FAISS_INDEX_PATH, docstore_path=settings.FAISS_DOCSTORE_PATH,
+                        manifest_path=settings.FAISS_MANIFEST_PATH):
+    """Returns the current (index, document store, manifest) if it supports incremental updates, else None."""
+    if not (os.path.exists(index_path) and os.path.exists(docstore_path) and os.path.exists(manifest_path)):
+        # Indexes built before stable ids and the document store have to be rebuilt once.
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if "chunking" not in manifest:
+        # Built before chunking; there are no parent documents to re-chunk from.
+        return None
+    return faiss.read_index(index_path), DocumentStore(docstore_path), manifest
+
+
+def update_index(index, docstore: DocumentStore, docs: list[Document], removed_ids: set[str], spec: IndexSpec,
+                 index_path=settings.FAISS_INDEX_PATH, manifest_path=settings.FAISS_MANIFEST_PATH):
+    """
+    Applies a diff to an existing index and document store in place: drops removed
+    documents, replaces changed ones and adds new ones. Only chunks of `docs` are embedded.
+    """
+    replaced_ids = removed_ids | {doc.metadata["id"] for doc in docs}
+    stale_vector_ids = set(docstore.vector_ids_for(replaced_ids))
+    if stale_vector_ids:
+        index.remove_ids(np.array(sorted(stale_vector_ids), dtype=np.int64))
+
+    chunks = chunk_documents(docs)
+    new_rows = [to_document_row(chunk) for chunk in chunks]
+    if chunks:
+        logger.info(f"[Indexer] Generating embeddings for {len(chunks)} chunks of {len(docs)} new or changed documents...")
+        index.add_with_ids(embed_documents(chunks), np.array([row["vector_id"] for row in new_rows], dtype=np.int64))
+
+    # New rows first, then the index, then deletions: a running app may briefly
+    # see rows the old index no longer points to, but never ids without a row.
+    docstore.upsert(new_rows)
+    docstore.upsert_parents({"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs)
+    _write_index_files(index, spec, index_path, manifest_path)
+    os.replace(index_path + ".tmp", index_path)
+    docstore.delete(stale_vector_ids - {row["vector_id"] for row in new_rows})
+    docstore.delete_parents(removed_ids)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    logger.info(f"[Indexer] Index update complete: {len(docs)} added or changed, {len(removed_ids)} removed, {index.ntotal} chunks total.")
+
+
+def run_indexing_pipeline(incremental: bool = True, index_spec: IndexSpec = None):
+    """
+    Main function to run the full indexing pipeline.
+    In incremental mode only new or changed publications are processed and embedded.
+    """
+    with start_trace("indexing", incremental=incremental):
+        _run_indexing_pipeline(incremental, index_spec)
+
+
+def _run_indexing_pipeline(incremental: bool, index_spec: IndexSpec = None):
+    publications = load_source_publications()
+    index_spec = index_spec or IndexSpec.from_settings()
+
+    if incremental:
+        existing = load_existing_index()
+        if existing is not None:
+            index, docstore, manifest = existing
+            current_spec = IndexSpec(**manifest["spec"])
+            to_process, removed_ids = diff_publications(publications, docstore.content_hashes())
+            if to_process or removed_ids:
+                logger.info(f"[Indexer] Incremental update: {len(to_process)} new or changed, {len(removed_ids)} removed.")
+            documents = load_source_documents(to_process) if to_process else []
+            replaced_ids = removed_ids | {doc.metadata["id"] for doc in documents}
+
+            # Pick the index family for the corpus as it will be after this update.
+            vector_count = index.ntotal - len(docstore.vector_ids_for(replaced_ids)) + len(chunk_documents(documents))
+            target_spec = index_spec.resolve(vector_count, index.d)
+            needs_rebuild = (
+                target_spec.index_type != current_spec.index_type
+                or manifest["chunking"] != chunking_config()
+                or manifest.get("embedding") != embedding_config()
+                or (len(to_process) + len(removed_ids) > 0 and not current_spec.supports_remove)
+            )
+            if not to_process and not removed_ids and not needs_rebuild:
+                logger.info("[Indexer] Index is up to date, nothing to do.")
+                return
+            if not needs_rebuild:
+                update_index(index, docstore, documents, removed_ids, current_spec)
+                return
+
+            # The index family, chunking or embedded fields changed, or the index cannot delete vectors:
+            # rebuild it from the stored, already enriched documents. Their chunk
+            # embeddings come from the embedding cache.
+            logger.info(f"[Indexer] Rebuilding {current_spec.index_type} index as {target_spec.index_type}...")
+            kept = [Document(page_content=parent["page_content"], metadata=parent["metadata"])
+                    for parent in docstore.parents() if parent["metadata"]["id"] not in replaced_ids]
+            build_and_save_index(kept + documents, index_spec)
+            return
+        logger.info("[Indexer] No incremental-capable index found, running a full rebuild...")
+
+    documents = load_source_documents(publications)
+    build_and_save_index(documents, index_spec)
 
 if __name__ == "__main__":
-    run_indexing_pipeline()
\ No newline at end of file
+    run_indexing_pipeline()
@@ -24,12 +24,43 @@ class Settings(BaseSettings):
     # Model Setting
     PROJECT_ID: str = "project-knowbot-460809"
     LOCATION: str = "us-central1"
+    # auto: Vertex AI when PROJECT_ID and LOCATION are set, else OpenAI and HuggingFace
+    # standin: deterministic local models for benchmarks and load tests (core/standin_models.py)
+    # record: the auto providers, with every reply stored in PROVIDER_RECORDING_PATH
+    # replay: recorded replies only, no provider access (core/recording.py)
+    MODEL_PROVIDER: str = "auto"
+    STANDIN_LLM_LATENCY_SECONDS: float = 0.0  # per call, before the first token
+    STANDIN_LLM_TOKEN_LATENCY_SECONDS: float = 0.0  # per generated token
+    STANDIN_EMBEDDING_LATENCY_SECONDS: float = 0.0  # per embedding request
+    STANDIN_EMBEDDING_DIM: int = 768
+    PROVIDER_RECORDING_PATH: str = "storage/recordings/providers.sqlite"
+    PROVIDER_RECORDING_MAX_ENTRIES: int = 1_000_000
+    # Replay waits as long as the recorded provider call took
+    PROVIDER_REPLAY_LATENCY: bool = True
 
 
     # LLM RAG File Path
     RAG_FILES_FILEPATH: str = "./data"
     RAG_INDEX_PREFIX: ClassVar[str] = f"lumigo"
 
+    # FAISS Index Storage
+    FAISS_INDEX_PATH: str = "storage/vector_index.faiss"
+    FAISS_DOCSTORE_PATH: str = "storage/docstore.sqlite"
+    # Legacy JSON metadata, migrated into the document store on first load
+    FAISS_METADATA_PATH: str = "storage/metadata.json"
+    FAISS_MANIFEST_PATH: str = "storage/manifest.json"
+    # Index family: auto | flat | ivf_flat | hnsw | ivf_pq (see core/index_factory.py)
+    FAISS_INDEX_TYPE: str = "auto"
+    FAISS_IVF_NLIST: int = 0
+    FAISS_IVF_NPROBE: int = 16
+    FAISS_HNSW_M: int = 32
+    FAISS_HNSW_EF_CONSTRUCTION: int = 200
+    FAISS_HNSW_EF_SEARCH: int = 64
+    FAISS_PQ_M: int = 64
+    FAISS_PQ_NBITS: int = 8
+    # Seconds between on-disk freshness checks of the shared index store
+    INDEX_RELOAD_CHECK_INTERVAL: float = 5.0
+
     DEVICE: str = "cpu"
     EMBEDDING_MODEL_NAME: str = "ibm-granite/granite-embedding-125m-english"
     RAG_INDEX_HF_EMBEDDING_MODEL_CONFIG: dict = {
@@ -50,6 +81,92 @@ class Settings(BaseSettings):
         print(v)
         return v
 
+    # Ingestion scheduling for LLM and embedding calls
+    INGEST_CONCURRENCY: int = 8
+    INGEST_RATE_LIMIT_PER_SECOND: float = 5.0  # 0 disables rate limiting
+    INGEST_MAX_RETRIES: int = 4
+    INGEST_RETRY_BASE_DELAY: float = 1.0
+    INGEST_RETRY_MAX_DELAY: float = 30.0
+
+    # Token-aware chunking of publications before indexing (cl100k_base tokens)
+    CHUNK_SIZE_TOKENS: int = 512
+    CHUNK_OVERLAP_TOKENS: int = 64
+    # Fields embedded for every chunk, joined by newlines: "page_content" is the chunk
+    # text, anything else (e.g. "source", "summary") is read from its metadata
+    INDEX_EMBEDDING_FIELDS: List[str] = ["page_content"]
+    # At most this many chunks of the same publication are returned per search
+    MAX_CHUNKS_PER_PARENT: int = 2
+
+    # Per-request execution budget of the agent graph
+    GRAPH_MAX_ITERATIONS: int = 3
+    GRAPH_DEADLINE_SECONDS: float = 60.0  # 0 disables the wall-clock deadline
+    GRAPH_TOKEN_BUDGET: int = 60_000  # estimated prompt + completion tokens, 0 disables
+    GRAPH_NODE_TIMEOUT_SECONDS: float = 30.0
+    GRAPH_NODE_WORKERS: int = 32
+
+    # Reranking of retrieved chunks: local (embedding cosine + MMR), cross_encoder, or llm
+    RERANK_MODE: str = "local"
+    # MMR trade-off between relevance (1.0) and diversity (0.0)
+    RERANK_MMR_LAMBDA: float = 0.7
+    # Used when RERANK_MODE is cross_encoder; needs sentence-transformers
+    RERANK_CROSS_ENCODER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+    # Persistent embedding cache keyed by (model name, text hash)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "storage/cache/embeddings.sqlite"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000
+
+    # Persistent cache of ingestion summaries and tags keyed by (content hash, prompt version),
+    # so an interrupted or repeated indexing run only enriches unfinished documents
+    ENRICHMENT_CACHE_ENABLED: bool = True
+    ENRICHMENT_CACHE_PATH: str = "storage/cache/enrichment.sqlite"
+    ENRICHMENT_CACHE_MAX_ENTRIES: int = 200_000
+
+    # Semantic cache of graph answers keyed by question embedding and index version
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 512
+
+    # Memoization of the small control-flow LLM calls (mode decision, expansion, rerank,
+    # continue decision). These calls run at LLM_MEMO_TEMPERATURE so replies are reusable.
+    LLM_MEMO_ENABLED: bool = True
+    LLM_MEMO_TEMPERATURE: float = 0.0
+    LLM_MEMO_MEMORY_ENTRIES: int = 1024
+    LLM_MEMO_PATH: str = "storage/cache/llm_memo.sqlite"
+    LLM_MEMO_MAX_ENTRIES: int = 50_000
+
+    # Local explore/direct router for decide_mode; below this confidence the LLM decides
+    ROUTER_ENABLED: bool = True
+    ROUTER_CONFIDENCE_THRESHOLD: float = 0.35
+    # Decision log, LLM decisions in it are used as router training data
+    ROUTER_LOG_PATH: str = "storage/router/decisions.jsonl"
+    # Size at which the decision log is rotated; one rotated log is kept
+    ROUTER_LOG_MAX_BYTES: int = 5_000_000
+
+    # Per-request tracing of graph nodes, tools, LLM, embedding and FAISS calls
+    TRACING_ENABLED: bool = True
+    # Finished traces are appended here as OpenTelemetry-style JSONL span records, which include
+    # the question text; empty (the default) disables export, e.g. "storage/traces/spans.jsonl"
+    TRACE_EXPORT_PATH: str = ""
+    # Size at which the span export is rotated; one rotated file is kept
+    TRACE_EXPORT_MAX_BYTES: int = 50_000_000
+    # Show the span timeline under each answer in the UI
+    TRACING_UI_TIMELINE: bool = True
+
+    # Load the index, embedding model and LLM client in a background thread at startup,
+    # while the UI is already serving, instead of on the first request
+    WARMUP_ENABLED: bool = True
+
+    # HTTP query API (python -m api.server): graph runs served at once, requests allowed
+    # to wait for a free slot, and how long they may wait before getting a 503
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
+    API_MAX_CONCURRENCY: int = 8
+    API_MAX_QUEUE: int = 32
+    API_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    API_MAX_BATCH_SIZE: int = 16
+
     DEMO_WEB_PAGE_TITLE: str = "Lumigo (.◜◡◝)"
     DEMO_WEB_DESCRIPTION: str = (
         """<ul><li>What would you like to search today?</li></<ul>"""
@@ -0,0 +1,170 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class DocumentStore:
+    """
+    Document rows keyed by FAISS vector id, stored in SQLite.
+
+    Each row is one indexed chunk; `doc_id` is the publication it belongs to,
+    whose full text is kept in the `parents` table. Only the rows a search
+    actually hits are read, so memory use does not grow with the corpus.
+    Each thread gets its own read connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Default rollback journal rather than WAL: full rebuilds swap the file
+        # with os.replace, which is unsafe with -wal/-shm side files.
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "vector_id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, content_hash TEXT, "
+            "page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_doc_id ON documents(doc_id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents ("
+            "doc_id TEXT PRIMARY KEY, content_hash TEXT, page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_row(vector_id: int, page_content: str, metadata: str) -> dict:
+        return {"vector_id": vector_id, "page_content": page_content, "metadata": json.loads(metadata)}
+
+    def get_many(self, vector_ids: List[int]) -> List[dict]:
+        """Return the rows for `vector_ids` in the same order, skipping unknown ids."""
+        found: Dict[int, dict] = {}
+        for start in range(0, len(vector_ids), 500):
+            batch = [int(vector_id) for vector_id in vector_ids[start:start + 500]]
+            placeholders = ",".join("?" * len(batch))
+            for vector_id, page_content, metadata in self._conn().execute(
+                f"SELECT vector_id, page_content, metadata FROM documents WHERE vector_id IN ({placeholders})",
+                batch,
+            ):
+                found[vector_id] = self._to_row(vector_id, page_content, metadata)
+        return [found[int(vector_id)] for vector_id in vector_ids if int(vector_id) in found]
+
+    def upsert(self, rows: Iterable[dict]) -> None:
+        """
+        Insert or replace rows shaped like {"vector_id", "page_content", "metadata"}.
+        Rows are grouped under `metadata["parent_id"]`, or their own id when unchunked.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO documents (vector_id, doc_id, content_hash, page_content, metadata) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (row["vector_id"],
+                 row["metadata"].get("parent_id") or row["metadata"].get("id", str(row["vector_id"])),
+                 row["metadata"].get("content_hash"), row["page_content"],
+                 json.dumps(row["metadata"], ensure_ascii=False))
+                for row in rows
+            ],
+        )
+        conn.execute("COMMIT")
+
+    def delete(self, vector_ids: Iterable[int]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany("DELETE FROM documents WHERE vector_id = ?", [(int(v),) for v in vector_ids])
+        conn.execute("COMMIT")
+
+    def upsert_parents(self, parents: Iterable[dict]) -> None:
+        """Insert or replace full documents shaped like {"page_content", "metadata"}, keyed by `metadata["id"]`."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO parents (doc_id, content_hash, page_content, metadata) VALUES (?, ?, ?, ?)",
+            [
+                (parent["metadata"]["id"], parent["metadata"].get("content_hash"), parent["page_content"],
+                 json.dumps(parent["metadata"], ensure_ascii=False))
+                for parent in parents
+            ],
+        )
+        conn.execute("COMMIT")
+
+    def delete_parents(self, doc_ids: Iterable[str]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany("DELETE FROM parents WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+        conn.execute("COMMIT")
+
+    def get_parent(self, doc_id: str) -> Optional[dict]:
+        """The full document a chunk was cut from, or None if it is not stored."""
+        row = self._conn().execute(
+            "SELECT page_content, metadata FROM parents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"page_content": row[0], "metadata": json.loads(row[1])}
+
+    def parents(self) -> Iterator[dict]:
+        """Stream every full document, e.g. to re-chunk and rebuild without re-processing."""
+        for page_content, metadata in self._conn().execute(
+            "SELECT page_content, metadata FROM parents ORDER BY doc_id"
+        ):
+            yield {"page_content": page_content, "metadata": json.loads(metadata)}
+
+    def vector_ids_for(self, doc_ids: Iterable[str]) -> List[int]:
+        """All vector ids stored for the given document ids."""
+        doc_ids = list(doc_ids)
+        vector_ids = []
+        for start in range(0, len(doc_ids), 500):
+            batch = doc_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            vector_ids.extend(
+                vector_id for (vector_id,) in self._conn().execute(
+                    f"SELECT vector_id FROM documents WHERE doc_id IN ({placeholders})", batch
+                )
+            )
+        return vector_ids
+
+    def content_hashes(self) -> Dict[str, str]:
+        """Map of document id to the content hash it was indexed with."""
+        return dict(self._conn().execute("SELECT doc_id, content_hash FROM documents"))
+
+    def rows(self) -> Iterator[dict]:
+        """Stream every indexed row."""
+        for vector_id, page_content, metadata in self._conn().execute(
+            "SELECT vector_id, page_content, metadata FROM documents ORDER BY vector_id"
+        ):
+            yield self._to_row(vector_id, page_content, metadata)
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @classmethod
+    def from_metadata_json(cls, metadata_path: str, path: str) -> "DocumentStore":
+        """One-off migration of a legacy metadata.json list into a document store."""
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        staging = cls(path + ".tmp")
+        staging.upsert(
+            {"vector_id": row.get("vector_id", position), "page_content": row["page_content"], "metadata": row["metadata"]}
+            for position, row in enumerate(metadata)
+        )
+        staging.close()
+        os.replace(path + ".tmp", path)
+        return cls(path)
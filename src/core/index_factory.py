@@ -0,0 +1,119 @@
+import math
+from typing import Any, Literal, Optional
+
+import faiss
+import numpy as np
+from pydantic import BaseModel, Field
+
+from logger import logger
+from .config import settings
+
+IndexType = Literal["auto", "flat", "ivf_flat", "hnsw", "ivf_pq"]
+
+# Corpus sizes at which "auto" moves to the next index family.
+AUTO_HNSW_MIN_VECTORS = 20_000
+AUTO_IVF_PQ_MIN_VECTORS = 1_000_000
+
+
+class IndexSpec(BaseModel):
+    """Which FAISS index family to build, plus its build-time and search-time knobs."""
+
+    index_type: IndexType = Field(default="auto", description="Index family, or 'auto' to pick from corpus size")
+    nlist: int = Field(default=0, description="IVF: number of coarse cells (0 = derive from corpus size)")
+    nprobe: int = Field(default=16, description="IVF: cells visited per query")
+    hnsw_m: int = Field(default=32, description="HNSW: graph neighbours per node")
+    ef_construction: int = Field(default=200, description="HNSW: candidate list size while building")
+    ef_search: int = Field(default=64, description="HNSW: candidate list size while searching")
+    pq_m: int = Field(default=64, description="IVF-PQ: sub-quantizers per vector (adjusted to divide the dimension)")
+    pq_nbits: int = Field(default=8, description="IVF-PQ: bits per sub-quantizer code")
+
+    @classmethod
+    def from_settings(cls) -> "IndexSpec":
+        return cls(
+            index_type=settings.FAISS_INDEX_TYPE,
+            nlist=settings.FAISS_IVF_NLIST,
+            nprobe=settings.FAISS_IVF_NPROBE,
+            hnsw_m=settings.FAISS_HNSW_M,
+            ef_construction=settings.FAISS_HNSW_EF_CONSTRUCTION,
+            ef_search=settings.FAISS_HNSW_EF_SEARCH,
+            pq_m=settings.FAISS_PQ_M,
+            pq_nbits=settings.FAISS_PQ_NBITS,
+        )
+
+    def resolve(self, num_vectors: int, dim: int) -> "IndexSpec":
+        """Return a concrete spec for a corpus of `num_vectors` vectors of dimension `dim`."""
+        index_type = self.index_type
+        if index_type == "auto":
+            if num_vectors < AUTO_HNSW_MIN_VECTORS:
+                index_type = "flat"
+            elif num_vectors < AUTO_IVF_PQ_MIN_VECTORS:
+                index_type = "hnsw"
+            else:
+                index_type = "ivf_pq"
+
+        pq_nbits = self.pq_nbits
+        if index_type == "ivf_pq":
+            # Each sub-quantizer trains 2**pq_nbits centroids and needs at least that many training points.
+            pq_nbits = min(pq_nbits, int(math.log2(num_vectors))) if num_vectors > 1 else 0
+            if pq_nbits < 1:
+                logger.warning(f"[IndexSpec] {num_vectors} vectors are too few to train IVF-PQ, using a flat index")
+                index_type, pq_nbits = "flat", self.pq_nbits
+            elif pq_nbits < self.pq_nbits:
+                logger.warning(f"[IndexSpec] {num_vectors} vectors are too few for {self.pq_nbits}-bit PQ codes, using {pq_nbits} bits")
+
+        nlist = self.nlist
+        if index_type in ("ivf_flat", "ivf_pq"):
+            # ~4 * sqrt(N) cells, while keeping at least 39 training points per cell.
+            nlist = nlist or int(4 * math.sqrt(num_vectors))
+            nlist = max(1, min(nlist, num_vectors // 39))
+
+        pq_m = self.pq_m
+        if index_type == "ivf_pq":
+            pq_m = max(m for m in range(1, min(pq_m, dim) + 1) if dim % m == 0)
+
+        return self.model_copy(update={"index_type": index_type, "nlist": nlist, "pq_m": pq_m, "pq_nbits": pq_nbits})
+
+    @property
+    def supports_remove(self) -> bool:
+        # HNSW graphs cannot delete nodes; changes require a full rebuild.
+        return self.index_type != "hnsw"
+
+    def search_params(self) -> Optional[Any]:
+        """Per-query FAISS search parameters matching this index family."""
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            return faiss.SearchParametersIVF(nprobe=self.nprobe)
+        if self.index_type == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=self.ef_search)
+        return None
+
+
+def create_index(spec: IndexSpec, dim: int) -> Any:
+    """Create an empty index for a resolved spec. Every index accepts `add_with_ids`."""
+    if spec.index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if spec.index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, spec.hnsw_m)
+        hnsw.hnsw.efConstruction = spec.ef_construction
+        return faiss.IndexIDMap2(hnsw)
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if spec.index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, spec.nlist)
+    elif spec.index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(quantizer, dim, spec.nlist, spec.pq_m, spec.pq_nbits)
+    else:
+        raise ValueError(f"Unsupported index type: {spec.index_type}")
+    # IVF indexes keep external ids natively; the hashtable direct map adds
+    # reconstruct-by-id while still allowing removals.
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def train_index(index: Any, vectors: np.ndarray, max_training_points: int = 256_000) -> None:
+    """Train the index if its family needs it, on a random sample of at most `max_training_points`."""
+    if index.is_trained:
+        return
+    if len(vectors) > max_training_points:
+        rng = np.random.default_rng(0)
+        vectors = vectors[rng.choice(len(vectors), max_training_points, replace=False)]
+    index.train(vectors)
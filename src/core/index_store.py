@@ -0,0 +1,165 @@
+import os
+import asyncio
+import json
+import time
+import threading
+from typing import Any, List, Optional, Tuple
+
+import faiss
+
+from logger import logger
+from .config import settings
+from .doc_store import DocumentStore
+from .index_factory import IndexSpec
+
+
+class IndexSnapshot:
+    """A loaded FAISS index together with the document store its vector ids point to."""
+
+    def __init__(self, index: Any, docs: DocumentStore, version: Tuple, spec: Optional[IndexSpec] = None):
+        self.index = index
+        self.docs = docs
+        self.version = version
+        self.spec = spec
+        # Runtime knobs (nprobe / efSearch) recorded in the manifest, passed per search call.
+        self.search_params = spec.search_params() if spec is not None else None
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def search(self, query_vectors: Any, k: int) -> Tuple[Any, Any]:
+        return self.index.search(query_vectors, k, params=self.search_params)
+
+    def reconstruct(self, vector_id: int) -> Any:
+        """The stored vector for `vector_id` (approximate for PQ indexes)."""
+        return self.index.reconstruct(vector_id)
+
+    def documents(self, vector_ids: List[int]) -> List[dict]:
+        """Return the document rows for the given vector ids, skipping unknown ones."""
+        return self.docs.get_many(vector_ids)
+
+    def parent(self, doc_id: str) -> Optional[dict]:
+        """Return the full document a chunk belongs to."""
+        return self.docs.get_parent(doc_id)
+
+
+class IndexStore:
+    """
+    Process-wide, thread-safe holder of the FAISS index and its document store.
+
+    The index is read once and shared by every request; document rows are read
+    from SQLite only for the vectors a search hits. Readers take a snapshot, so
+    a reload never swaps the index out from under a running search. The store
+    checks the mtime and size of the index and manifest files at most once every
+    `check_interval` seconds and reloads when they change on disk.
+    """
+
+    def __init__(
+        self,
+        index_path: str = settings.FAISS_INDEX_PATH,
+        docstore_path: str = settings.FAISS_DOCSTORE_PATH,
+        manifest_path: str = settings.FAISS_MANIFEST_PATH,
+        check_interval: float = settings.INDEX_RELOAD_CHECK_INTERVAL,
+        legacy_metadata_path: str = settings.FAISS_METADATA_PATH,
+    ):
+        self.index_path = index_path
+        self.docstore_path = docstore_path
+        self.manifest_path = manifest_path
+        self.check_interval = check_interval
+        self.legacy_metadata_path = legacy_metadata_path
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _signature(self) -> Optional[Tuple]:
+        # Every build replaces the index file and rewrites the manifest last,
+        # so these two are enough to notice a new index and document store.
+        try:
+            index_stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        try:
+            manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            # Indexes built before the manifest existed.
+            manifest_mtime = None
+        return index_stat.st_mtime_ns, index_stat.st_size, manifest_mtime
+
+    def _open_docstore(self) -> Optional[DocumentStore]:
+        if os.path.exists(self.docstore_path):
+            return DocumentStore(self.docstore_path)
+        if os.path.exists(self.legacy_metadata_path):
+            logger.info(f"Migrating {self.legacy_metadata_path} into document store {self.docstore_path}")
+            return DocumentStore.from_metadata_json(self.legacy_metadata_path, self.docstore_path)
+        return None
+
+    def _load(self, signature: Tuple) -> Optional[IndexSnapshot]:
+        try:
+            index = faiss.read_index(self.index_path)
+            docs = self._open_docstore()
+            if docs is None:
+                logger.error(f"Document store not found at {self.docstore_path}")
+                return None
+            spec = None
+            if signature[-1] is not None:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    spec = IndexSpec(**json.load(f)["spec"])
+            doc_count = docs.count()
+        except Exception as e:
+            logger.error(f"Failed to load FAISS index or document store: {e}")
+            return None
+
+        if index.ntotal != doc_count:
+            # The files are being rewritten; keep serving the previous snapshot.
+            logger.warning(
+                f"FAISS index ({index.ntotal} vectors) and document store ({doc_count} rows) "
+                f"are out of sync, skipping reload"
+            )
+            return None
+
+        logger.info(f"FAISS index and document store loaded successfully from {self.index_path}")
+        return IndexSnapshot(index, docs, signature, spec)
+
+    def _refresh(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._snapshot is not None and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            signature = self._signature()
+            if signature is None:
+                if self._snapshot is None:
+                    logger.error(f"FAISS index not found at {self.index_path}")
+                return
+            if not force and self._snapshot is not None and self._snapshot.version == signature:
+                return
+
+            snapshot = self._load(signature)
+            if snapshot is not None:
+                self._snapshot = snapshot
+
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """Return the current index snapshot, reloading it first if the files changed."""
+        if self._snapshot is None or time.monotonic() - self._last_check >= self.check_interval:
+            self._refresh()
+        return self._snapshot
+
+    async def asnapshot(self) -> Optional[IndexSnapshot]:
+        """Async `snapshot`; a due reload check (and any reload) runs in a worker thread."""
+        if self._snapshot is None or time.monotonic() - self._last_check >= self.check_interval:
+            await asyncio.to_thread(self._refresh)
+        return self._snapshot
+
+    def reload(self) -> Optional[IndexSnapshot]:
+        """Force a reload from disk, e.g. right after the index has been rebuilt."""
+        self._refresh(force=True)
+        return self._snapshot
+
+    @property
+    def version(self) -> Optional[Tuple]:
+        snapshot = self.snapshot()
+        return snapshot.version if snapshot is not None else None
+
+
+index_store = IndexStore()
@@ -1,7 +1,27 @@
+import re
+import json
+import hashlib
+from typing import Optional
+
+from langchain_core.exceptions import OutputParserException
 from langchain_core.prompts import ChatPromptTemplate
+from pydantic import ValidationError
+
+from logger import logger
+from schema.doc_schema import EnrichmentResult
+from utils.sqlite_cache import SQLiteCache
+from .config import settings
+from .model import get_llm, llm_model_name
+from .prompt import SUMMARY_PROMPT, TAGS_PROMPT, ENRICH_PROMPT
 
-from .model import llm
-from .prompt import SUMMARY_PROMPT, TAGS_PROMPT
+# Changes whenever the enrichment prompt or model changes, invalidating cached results.
+ENRICH_PROMPT_VERSION = hashlib.sha256(
+    f"{llm_model_name()}\0{ENRICH_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+
+enrichment_cache = None
+if settings.ENRICHMENT_CACHE_ENABLED:
+    enrichment_cache = SQLiteCache(settings.ENRICHMENT_CACHE_PATH, settings.ENRICHMENT_CACHE_MAX_ENTRIES, table="enrichment")
 
 async def get_summary_async(input_text: str) -> str:
     """Asynchronously generate a summary of the input text."""
@@ -11,7 +31,7 @@ async def get_summary_async(input_text: str) -> str:
             ("human", "{input_text}"),
         ]
     )
-    chain = summary_prompt | llm
+    chain = summary_prompt | get_llm()
     response = await chain.ainvoke({"input_text": input_text})
     return response.content.strip()
 
@@ -23,7 +43,75 @@ async def get_tags_async(input_text: str) -> list[str]:
             ("human", "{input_text}"),
         ]
     )
-    chain = tags_prompt | llm
+    chain = tags_prompt | get_llm()
     response = await chain.ainvoke({"input_text": input_text})
     tags_str = response.content.strip()
     return [tag.strip() for tag in tags_str.split(",") if tag.strip()]
+
+def parse_enrichment(text: str) -> EnrichmentResult:
+    """Parse a JSON enrichment reply, tolerating code fences and comma-separated tags."""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match is None:
+        raise ValueError(f"No JSON object in enrichment response: {text[:200]!r}")
+    data = json.loads(match.group(0))
+    tags = data.get("tags", [])
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return EnrichmentResult(
+        summary=str(data.get("summary", "")).strip(),
+        tags=[tag.strip() for tag in tags if tag and tag.strip()],
+    )
+
+async def get_enrichment_async(input_text: str) -> EnrichmentResult:
+    """Asynchronously generate the summary and tags of the input text in one LLM call."""
+    enrich_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", ENRICH_PROMPT.strip()),
+            ("human", "{input_text}"),
+        ]
+    )
+    try:
+        chain = enrich_prompt | get_llm().with_structured_output(EnrichmentResult)
+        result = await chain.ainvoke({"input_text": input_text})
+        if isinstance(result, EnrichmentResult):
+            return result
+        if isinstance(result, dict):
+            return EnrichmentResult(**result)
+        logger.warning(f"[Enrichment] Unexpected structured output {type(result).__name__}, parsing raw reply")
+    except NotImplementedError:
+        pass
+    except (OutputParserException, ValidationError) as e:
+        # Only a malformed reply falls back; rate-limit, server and timeout errors propagate
+        # so the scheduler backs off and retries them.
+        logger.warning(f"[Enrichment] Structured output failed ({e}), parsing raw reply")
+
+    # The prompt asks for the same JSON object, so a plain call can be parsed by hand.
+    chain = enrich_prompt | get_llm()
+    response = await chain.ainvoke({"input_text": input_text})
+    return parse_enrichment(response.content)
+
+def _enrichment_key(input_text: str) -> str:
+    content_hash = hashlib.sha256(input_text.encode("utf-8")).hexdigest()
+    return f"{ENRICH_PROMPT_VERSION}:{content_hash}"
+
+def get_cached_enrichment(input_text: str) -> Optional[EnrichmentResult]:
+    """Return the enrichment stored for this exact text and prompt version, if any."""
+    if enrichment_cache is None:
+        return None
+    value = enrichment_cache.get(_enrichment_key(input_text))
+    if value is None:
+        return None
+    return EnrichmentResult.model_validate_json(value)
+
+def save_enrichment(input_text: str, result: EnrichmentResult) -> None:
+    """Checkpoint an enrichment result as soon as it is produced."""
+    if enrichment_cache is not None:
+        enrichment_cache.set(_enrichment_key(input_text), result.model_dump_json().encode("utf-8"))
+
+async def get_enrichment_cached_async(input_text: str, scheduler) -> EnrichmentResult:
+    """Reuse a checkpointed enrichment, or generate one through `scheduler` and checkpoint it."""
+    result = get_cached_enrichment(input_text)
+    if result is None:
+        result = await scheduler.run(get_enrichment_async, input_text)
+        save_enrichment(input_text, result)
+    return result
@@ -0,0 +1,154 @@
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from logger import logger
+from utils.sqlite_cache import SQLiteCache
+from .config import settings
+from .model import get_llm, llm_model_name
+from .tracing import span
+from .budget import charge_tokens, count_tokens
+
+
+class LLMMemo:
+    """
+    Memoizes small, repetitive control-flow LLM calls (mode decision, query expansion,
+    rerank, continue decision).
+
+    Calls are made at a fixed temperature, so a prompt maps to one canonical reply.
+    Replies are keyed on (model, temperature, namespace, prompt hash) and kept in a
+    bounded in-memory LRU in front of a persistent SQLite cache shared across sessions.
+    """
+
+    def __init__(
+        self,
+        model: Any = None,
+        enabled: bool = settings.LLM_MEMO_ENABLED,
+        temperature: float = settings.LLM_MEMO_TEMPERATURE,
+        memory_entries: int = settings.LLM_MEMO_MEMORY_ENTRIES,
+        path: Optional[str] = settings.LLM_MEMO_PATH,
+        max_entries: int = settings.LLM_MEMO_MAX_ENTRIES,
+    ):
+        # Without an explicit model the process-wide LLM is bound on the first cache miss.
+        self._model = model
+        self._bound = None
+        self.model_name = (getattr(model, "model_name", None) or type(model).__name__) if model is not None else llm_model_name()
+        self.temperature = temperature
+        self.enabled = enabled
+        self.memory_entries = memory_entries
+        self.disk = SQLiteCache(path, max_entries, table="llm_memo") if enabled and path else None
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        if self._bound is None:
+            self._bound = (self._model or get_llm()).bind(temperature=self.temperature)
+        return self._bound
+
+    def _key(self, messages: List[BaseMessage], namespace: str) -> str:
+        prompt = json.dumps([[message.type, message.content] for message in messages], ensure_ascii=False)
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:t={self.temperature}:{namespace}:{prompt_hash}"
+
+    def _remember(self, key: str, reply: str) -> None:
+        with self._lock:
+            self._memory[key] = reply
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        reply = self._memory_lookup(key)
+        if reply is not None:
+            return reply
+        return self._disk_lookup(key)
+
+    def _memory_lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            reply = self._memory.get(key)
+            if reply is not None:
+                self._memory.move_to_end(key)
+            return reply
+
+    def _disk_lookup(self, key: str) -> Optional[str]:
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                reply = value.decode("utf-8")
+                self._remember(key, reply)
+                return reply
+        return None
+
+    def _save(self, key: str, reply: str) -> None:
+        self._remember(key, reply)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, reply.encode("utf-8"))
+            except Exception as e:
+                logger.warning(f"[LLMMemo] Could not persist reply: {e}")
+
+    def invoke(self, messages: List[BaseMessage], namespace: str = "") -> str:
+        """Return the reply text for `messages`, calling the LLM only on a cache miss."""
+        with span(f"llm:{namespace or 'memo'}", "llm") as llm_span:
+            if not self.enabled:
+                reply = self.model.invoke(messages).content
+                self._count(llm_span, messages, reply, cache_hit=False)
+                return reply
+            key = self._key(messages, namespace)
+            reply = self._lookup(key)
+            cache_hit = reply is not None
+            if not cache_hit:
+                reply = self.model.invoke(messages).content
+                self._save(key, reply)
+            self._count(llm_span, messages, reply, cache_hit)
+            return reply
+
+    async def ainvoke(self, messages: List[BaseMessage], namespace: str = "") -> str:
+        """Async `invoke`; only a cache miss awaits the LLM."""
+        with span(f"llm:{namespace or 'memo'}", "llm") as llm_span:
+            if not self.enabled:
+                reply = (await self.model.ainvoke(messages)).content
+                self._count(llm_span, messages, reply, cache_hit=False)
+                return reply
+            key = self._key(messages, namespace)
+            # The SQLite cache (reads, and writes with their commit) is used from a worker thread.
+            reply = self._memory_lookup(key)
+            if reply is None and self.disk is not None:
+                reply = await asyncio.to_thread(self._disk_lookup, key)
+            cache_hit = reply is not None
+            if not cache_hit:
+                reply = (await self.model.ainvoke(messages)).content
+                await asyncio.to_thread(self._save, key, reply)
+            self._count(llm_span, messages, reply, cache_hit)
+            return reply
+
+    @staticmethod
+    def _count(llm_span: Any, messages: List[BaseMessage], reply: str, cache_hit: bool) -> None:
+        # Cache hits are free; the tokens the provider was actually sent are recorded and charged to the budget.
+        if cache_hit:
+            llm_span.set(cache_hit=True, input_tokens=0, output_tokens=0)
+        else:
+            input_tokens, output_tokens = count_tokens(*(message.content for message in messages)), count_tokens(reply)
+            llm_span.set(cache_hit=False, input_tokens=input_tokens, output_tokens=output_tokens)
+            charge_tokens(input_tokens + output_tokens)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        stats = {"memory_entries": len(self._memory)}
+        if self.disk is not None:
+            stats.update(self.disk.stats())
+        return stats
+
+
+llm_memo = LLMMemo()
@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import List, Literal, Optional, Tuple
+
+import numpy as np
+
+from logger import logger
+from .config import settings
+from .model import embedding_model
+
+Mode = Literal["explore", "direct"]
+
+# Labelled seed questions, so the router has centroids before any decisions are logged.
+SEED_EXAMPLES: List[Tuple[str, Mode]] = [
+    ("Tell me about climate change", "explore"),
+    ("What are the latest advancements in AI?", "explore"),
+    ("Give me an overview of research on LLM orchestration", "explore"),
+    ("What approaches exist for retrieval augmented generation?", "explore"),
+    ("Compare methods for evaluating language models", "explore"),
+    ("What are the trends in renewable energy research?", "explore"),
+    ("What year was the Kyoto Protocol signed?", "direct"),
+    ("Who proposed the transformer architecture?", "direct"),
+    ("How many parameters does GPT-3 have?", "direct"),
+    ("What is the definition of precision in classification?", "direct"),
+    ("Which dataset was used to train BERT?", "direct"),
+    ("When was the first FAISS release published?", "direct"),
+]
+
+EXPLORE_CUES = (
+    "tell me about", "overview", "explain", "compare", "comparison", "trend", "survey", "landscape",
+    "advancement", "approaches", "ideas", "state of the art", "what are", "ways to", "pros and cons", "discuss",
+)
+DIRECT_CUES = (
+    "what year", "when ", "who ", "how many", "how much", "which ", "define", "definition",
+    "what is the", "name of", "is it true", "does ", "did ",
+)
+
+
+class ModeRouter:
+    """
+    Local, LLM-free classifier for the explore/direct decision.
+
+    Combines the cosine margin between the question embedding and the two class
+    centroids with a lexical cue score. Centroids are built once from the seed examples
+    plus the LLM-labelled decisions in the decision log, then updated in place as new
+    LLM decisions are recorded. Returns no mode when the combined confidence is below
+    `threshold`, so the caller can fall back to the LLM.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.ROUTER_CONFIDENCE_THRESHOLD,
+        log_path: str = settings.ROUTER_LOG_PATH,
+        log_max_bytes: int = settings.ROUTER_LOG_MAX_BYTES,
+        embedding_weight: float = 0.7,
+        embedding_scale: float = 10.0,
+    ):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.embedding_weight = embedding_weight
+        self.embedding_scale = embedding_scale
+        # Per-mode sum of unit example vectors; a centroid is its sum normalized.
+        self._sums: Optional[dict] = None
+        self._centroids: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _log_paths(self) -> List[str]:
+        # The rotated-out log first, so examples keep their logged order.
+        return [self.log_path + ".1", self.log_path]
+
+    def _labelled_examples(self) -> List[Tuple[str, Mode]]:
+        examples = list(SEED_EXAMPLES)
+        for path in self._log_paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    # Only LLM labels are trusted for training; the router's own
+                    # decisions are logged for analysis but would reinforce its mistakes.
+                    if record.get("source") == "llm" and record.get("mode") in ("explore", "direct"):
+                        examples.append((record["question"], record["mode"]))
+        return examples
+
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+    def _set_sums(self, sums: dict) -> None:
+        self._sums = sums
+        # Replaced, not mutated, so a concurrent `score` never sees a half-updated pair.
+        self._centroids = {mode: self._unit(total) for mode, total in sums.items()}
+
+    def _ensure_trained(self) -> dict:
+        centroids = self._centroids
+        if centroids is not None:
+            return centroids
+        with self._lock:
+            if self._centroids is not None:
+                return self._centroids
+            examples = self._labelled_examples()
+            vectors = self._unit(embedding_model.get_embeddings_array([question for question, _ in examples]))
+            labels = np.array([mode for _, mode in examples])
+            self._set_sums({mode: vectors[labels == mode].sum(axis=0) for mode in ("explore", "direct")})
+            return self._centroids
+
+    @staticmethod
+    def lexical_score(question: str) -> float:
+        """Positive for exploratory wording, negative for targeted questions, in [-1, 1]."""
+        text = " " + re.sub(r"\s+", " ", question.lower()) + " "
+        explore = sum(cue in text for cue in EXPLORE_CUES)
+        direct = sum(cue in text for cue in DIRECT_CUES)
+        # Quoted phrases and numbers usually point at a specific fact.
+        direct += bool(re.search(r"\"[^\"]+\"|\b\d{2,}\b", question))
+        return float(np.tanh(explore - direct))
+
+    def _score(self, question: str, query_vector: np.ndarray, centroids: dict) -> float:
+        query = self._unit(np.asarray(query_vector, dtype=np.float32).reshape(-1))
+        margin = float(query @ centroids["explore"] - query @ centroids["direct"])
+        embedding_score = float(np.tanh(margin * self.embedding_scale))
+        return self.embedding_weight * embedding_score + (1 - self.embedding_weight) * self.lexical_score(question)
+
+    def score(self, question: str, query_vector: Optional[np.ndarray] = None) -> float:
+        """Signed score: > 0 favours explore, < 0 favours direct; |score| is the confidence."""
+        centroids = self._ensure_trained()
+        if query_vector is None:
+            query_vector = embedding_model.get_embeddings_array([question])[0]
+        return self._score(question, query_vector, centroids)
+
+    def _decide(self, score: float) -> Tuple[Optional[Mode], float]:
+        confidence = abs(score)
+        if confidence < self.threshold:
+            return None, confidence
+        return ("explore" if score > 0 else "direct"), confidence
+
+    def route(self, question: str, query_vector: Optional[np.ndarray] = None) -> Tuple[Optional[Mode], float]:
+        """Return (mode, confidence), or (None, confidence) when the LLM should decide."""
+        try:
+            return self._decide(self.score(question, query_vector))
+        except Exception as e:
+            logger.warning(f"[ModeRouter] Routing failed, deferring to LLM: {e}")
+            return None, 0.0
+
+    async def aroute(self, question: str) -> Tuple[Optional[Mode], float]:
+        """Async `route`: training and the question embedding never block the event loop."""
+        try:
+            centroids = self._centroids
+            if centroids is None:
+                centroids = await asyncio.to_thread(self._ensure_trained)
+            query_vector = (await embedding_model.aget_embeddings_array([question]))[0]
+            # Scores against the centroids fetched above, so nothing here can trigger training.
+            return self._decide(self._score(question, query_vector, centroids))
+        except Exception as e:
+            logger.warning(f"[ModeRouter] Routing failed, deferring to LLM: {e}")
+            return None, 0.0
+
+    def _learn(self, question: str, mode: Mode) -> None:
+        # Not trained yet: the first `route` reads this label back from the log.
+        if self._sums is None:
+            return
+        # The question was just routed, so its embedding comes from the cache.
+        vector = self._unit(embedding_model.get_embeddings_array([question])[0])
+        with self._lock:
+            if self._sums is not None:
+                self._set_sums({**self._sums, mode: self._sums[mode] + vector})
+
+    def _append(self, record: dict) -> None:
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            # Keep one rotated-out log; older decisions are dropped so the log stays bounded.
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= self.log_max_bytes:
+                os.replace(self.log_path, self._log_paths[0])
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, question: str, mode: Mode, source: str, confidence: Optional[float] = None) -> None:
+        """Append a decision to the log; LLM decisions also update the router's centroids."""
+        record = {
+            "question": question,
+            "mode": mode,
+            "source": source,
+            "confidence": confidence,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            self._append(record)
+        except OSError as e:
+            logger.warning(f"[ModeRouter] Could not log decision: {e}")
+        if source == "llm":
+            try:
+                self._learn(question, mode)
+            except Exception as e:
+                logger.warning(f"[ModeRouter] Could not learn from decision: {e}")
+
+    async def arecord(self, question: str, mode: Mode, source: str, confidence: Optional[float] = None) -> None:
+        """Async `record`; the log write and embedding lookup run in a worker thread."""
+        await asyncio.to_thread(self.record, question, mode, source, confidence)
+
+
+mode_router = ModeRouter()
@@ -1,38 +1,155 @@
+import asyncio
+import hashlib
+import threading
+import numpy as np
+from typing import Any, List
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_google_vertexai import ChatVertexAI
-from typing import List
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+from utils.sqlite_cache import SQLiteCache
+from .config import settings
+from .tracing import span
+from .standin_models import StandinChatModel, StandinEmbeddings
+from .recording import ProviderRecording, RecordReplayChatModel, RecordReplayEmbeddings
 
-from google.cloud import aiplatform
-from vertexai.preview.language_models import TextEmbeddingModel
+# Provider SDKs are imported and their clients built on first use, so importing core
+# stays cheap and a cold start only pays for what the first request needs.
+VERTEXAI_CHAT_MODEL = "gemini-2.0-flash-001"
+OPENAI_CHAT_MODEL = "gpt-4o-mini"
+VERTEXAI_EMBEDDING_MODEL = "text-multilingual-embedding-002"
 
+provider_recording = ProviderRecording() if settings.MODEL_PROVIDER in ("record", "replay") else None
+
+_lock = threading.Lock()
+_llm = None
+_vertexai_initialized = False
+
+
+def _use_vertexai() -> bool:
+    return settings.MODEL_PROVIDER not in ("standin", "replay") and bool(len(settings.PROJECT_ID) and len(settings.LOCATION))
+
+
+def _init_vertexai() -> None:
+    global _vertexai_initialized
+    if not _vertexai_initialized:
+        from google.cloud import aiplatform
+
+        aiplatform.init(project=settings.PROJECT_ID, location=settings.LOCATION)
+        _vertexai_initialized = True
+
+
+def llm_model_name() -> str:
+    """Name of the configured chat model, known without building the client."""
+    if settings.MODEL_PROVIDER == "standin":
+        return StandinChatModel.model_fields["model_name"].default
+    if settings.MODEL_PROVIDER == "replay":
+        return RecordReplayChatModel.model_fields["model_name"].default
+    return VERTEXAI_CHAT_MODEL if _use_vertexai() else OPENAI_CHAT_MODEL
+
+
+def _create_llm() -> Any:
+    # chatgpt or vertexai, or local stand-ins / recorded replies for benchmarks and load tests
+    if settings.MODEL_PROVIDER == "standin":
+        return StandinChatModel()
+    if settings.MODEL_PROVIDER == "replay":
+        return RecordReplayChatModel(mode="replay", recording=provider_recording)
+    if _use_vertexai():
+        from langchain_google_vertexai import ChatVertexAI
+
+        _init_vertexai()
+        llm = ChatVertexAI(
+            model_name=VERTEXAI_CHAT_MODEL,
+            temperature=0.7,
+            streaming=True
+        )
+    else:
+        from langchain_openai import ChatOpenAI
+
+        # A stalled request is abandoned by the graph at its node timeout; end it there too.
+        llm = ChatOpenAI(model=OPENAI_CHAT_MODEL, streaming=True, timeout=settings.GRAPH_NODE_TIMEOUT_SECONDS)
+
+    if settings.MODEL_PROVIDER == "record":
+        llm = RecordReplayChatModel(mode="record", recording=provider_recording, model=llm,
+                                    model_name=llm_model_name())
+    return llm
+
+
+def get_llm() -> Any:
+    """The process-wide chat model, built on the first call."""
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = _create_llm()
+    return _llm
 
-from .config import settings
 
-aiplatform.init(project=settings.PROJECT_ID, location=settings.LOCATION)
-
-# chatgpt or vertexai
-if len(settings.PROJECT_ID) and len(settings.LOCATION):
-    llm = ChatVertexAI(
-        model_name="gemini-2.0-flash-001",
-        temperature=0.7,
-        streaming=False
-    )
-else:
-    llm = ChatOpenAI(model="gpt-4o-mini", streaming=False)
-    
 class EmbeddingModelWrapper:
+    """
+    Embeddings with a persistent per-text cache in front of the provider. The provider
+    model is loaded on the first call that misses the cache (or by `load`).
+    """
+
     def __init__(self):
-        if len(settings.PROJECT_ID) and len(settings.LOCATION):
-            self.use_vertexai = True
-            self.model = TextEmbeddingModel.from_pretrained("text-multilingual-embedding-002")
+        self.use_vertexai = _use_vertexai()
+        if settings.MODEL_PROVIDER == "standin":
+            self.model_name = f"standin-embedding-{settings.STANDIN_EMBEDDING_DIM}"
+        elif settings.MODEL_PROVIDER == "replay":
+            self.model_name = "replay-embedding"
+        elif self.use_vertexai:
+            self.model_name = VERTEXAI_EMBEDDING_MODEL
         else:
-            self.use_vertexai = False
-            self.model = HuggingFaceBgeEmbeddings(**settings.RAG_INDEX_HF_EMBEDDING_MODEL_CONFIG)
+            self.model_name = settings.RAG_INDEX_HF_EMBEDDING_MODEL_CONFIG["model_name"]
+        self._model = None
+        self._lock = threading.Lock()
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        # Every provider call goes through the recorder, which stores the vectors for replay.
+        self.recorder = None
+        if settings.MODEL_PROVIDER == "record":
+            self.recorder = RecordReplayEmbeddings("record", provider_recording, self._provider_embed, self._provider_aembed)
+
+        self.cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.cache = SQLiteCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES, table="embeddings")
+
+    def _create_model(self) -> Any:
+        if settings.MODEL_PROVIDER == "standin":
+            return StandinEmbeddings()
+        if settings.MODEL_PROVIDER == "replay":
+            return RecordReplayEmbeddings("replay", provider_recording)
+        if self.use_vertexai:
+            from vertexai.preview.language_models import TextEmbeddingModel
+
+            _init_vertexai()
+            return TextEmbeddingModel.from_pretrained(self.model_name)
+        from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+
+        return HuggingFaceBgeEmbeddings(**settings.RAG_INDEX_HF_EMBEDDING_MODEL_CONFIG)
+
+    def load(self) -> Any:
+        """Load the provider model now instead of on the first cache miss."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._create_model()
+        return self._model
+
+    @property
+    def model(self) -> Any:
+        return self.load()
+
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if self.recorder is not None:
+            return self.recorder.embed_documents(texts)
+        return self._provider_embed(texts)
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        if self.recorder is not None:
+            return await self.recorder.aembed_documents(texts)
+        return await self._provider_aembed(texts)
+
+    def _provider_embed(self, texts: List[str]) -> List[List[float]]:
         if self.use_vertexai:
             # The Vertex AI model expects a list of strings.
             response = self.model.get_embeddings(texts)
@@ -42,4 +159,66 @@ class EmbeddingModelWrapper:
             # The HuggingFace model also expects a list of strings.
             return self.model.embed_documents(texts)
 
+    async def _provider_aembed(self, texts: List[str]) -> List[List[float]]:
+        if self._model is None:
+            # Loading the model (a HuggingFace checkpoint, say) takes seconds; keep it off the event loop.
+            await asyncio.to_thread(self.load)
+        if self.use_vertexai:
+            response = await self.model.get_embeddings_async(texts)
+            return [embedding.values for embedding in response]
+        else:
+            return await self.model.aembed_documents(texts)
+
+    def _lookup(self, texts: List[str]):
+        keys = [self._cache_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        return keys, cached, missing
+
+    def _store(self, cached: dict, missing: dict, vectors: List[List[float]]) -> None:
+        new_entries = {key: np.asarray(vector, dtype=np.float32).tobytes() for key, vector in zip(missing, vectors)}
+        self.cache.set_many(new_entries)
+        cached.update(new_entries)
+
+    @staticmethod
+    def _stack(keys: List[str], cached: dict) -> np.ndarray:
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack([np.frombuffer(cached[key], dtype=np.float32) for key in keys])
+
+    def get_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Embed `texts` into a (len(texts), dim) float32 matrix."""
+        with span("embedding", "embedding", texts=len(texts)) as embed_span:
+            if self.cache is None:
+                embed_span.set(cache_hits=0, cache_misses=len(texts))
+                return np.asarray(self._embed(texts), dtype=np.float32)
+
+            # Only texts that have never been embedded with this model reach the provider.
+            keys, cached, missing = self._lookup(texts)
+            embed_span.set(cache_hits=len(set(keys)) - len(missing), cache_misses=len(missing))
+            if missing:
+                self._store(cached, missing, self._embed(list(missing.values())))
+            return self._stack(keys, cached)
+
+    async def aget_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Async `get_embeddings_array`; the provider call does not block the event loop."""
+        with span("embedding", "embedding", texts=len(texts)) as embed_span:
+            if self.cache is None:
+                embed_span.set(cache_hits=0, cache_misses=len(texts))
+                return np.asarray(await self._aembed(texts), dtype=np.float32)
+
+            # The cache is SQLite (a hit also updates its access time); query it from a worker thread.
+            keys, cached, missing = await asyncio.to_thread(self._lookup, texts)
+            embed_span.set(cache_hits=len(set(keys)) - len(missing), cache_misses=len(missing))
+            if missing:
+                vectors = await self._aembed(list(missing.values()))
+                await asyncio.to_thread(self._store, cached, missing, vectors)
+            return self._stack(keys, cached)
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.get_embeddings_array(texts).tolist()
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {}
+
 embedding_model = EmbeddingModelWrapper()
@@ -1,15 +1,30 @@
 import re
+import time
 import asyncio
-from typing import Literal, TypedDict, List, Dict, Any, Optional
+import operator
+from typing import Annotated, Literal, TypedDict, List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
 from langgraph.graph import StateGraph, END, START
+from langgraph.config import get_stream_writer
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 
 # Assuming these prompts are defined correctly for the new agent roles
-from .prompt import MODE_DECIDE_PROMPT, EXPAND_PROMPT, REFERENCE_PROMPT, RERANK_PROMPT
-from .model import llm
-from .agent_tools import AgentToolRegistry
-
-MAX_ITERATIONS = 3
+from .prompt import MODE_DECIDE_PROMPT, EXPAND_PROMPT, EXPAND_REFINE_PROMPT, REFERENCE_PROMPT, RERANK_PROMPT
+from .config import settings
+from .model import embedding_model
+from .agent_tools import AnswerGenerationTool, tool_registry
+from .answer_cache import answer_cache
+from .llm_memo import llm_memo
+from .mode_router import mode_router
+from .budget import budget_exhausted, budgeted_node, count_tokens, keep_partial, node_timeout, start_budget
+from .tracing import span, start_trace, Trace
+from logger import logger
+
+MAX_ITERATIONS = settings.GRAPH_MAX_ITERATIONS
+# How much of the current answer a refinement pass's query expansion gets to see
+REFINE_ANSWER_EXCERPT_CHARS = 1500
+# Share of the node's time budget held back at the end of answer streaming, so the answer is
+# finished by the node itself rather than by its timeout fallback
+ANSWER_STOP_MARGIN = 0.1
 
 class GraphState(TypedDict):
     logs: dict[str, list[str]]
@@ -20,8 +35,28 @@ class GraphState(TypedDict):
     similarities: List[float]
     mode: Literal["explore", "direct"]
     retrieved_docs: List[dict]
+    prefetched_docs: List[dict]
     final_answer: str
     original_question: str
+    # Per-request budget: wall-clock deadline (epoch seconds, 0 = none) and estimated LLM tokens spent
+    deadline: float
+    tokens_used: Annotated[int, operator.add]
+    # "expand_query" to refine the answer again, or END
+    next_step: str
+
+def _decide_mode_from_router(state: GraphState, mode: Optional[str], confidence: float) -> Optional[dict]:
+    logs = state["logs"]["decide_mode"]
+    if mode is None:
+        logs.append(f"Router confidence {confidence:.2f} too low, asking LLM")
+        return None
+    logs.append(f"Router decision: {mode} (confidence {confidence:.2f})")
+    return {"mode": mode}
+
+def _decide_mode_from_llm(state: GraphState, prompt: str, reply: str) -> dict:
+    decision = reply.strip().lower()
+    mode = "explore" if "explore" in decision else "direct"
+    state["logs"]["decide_mode"].append(f"LLM decision: {decision}")
+    return {"mode": mode}
 
 def decide_mode(state: GraphState) -> dict:
     """
@@ -31,11 +66,39 @@ def decide_mode(state: GraphState) -> dict:
     logs = state.setdefault("logs", {})
     logs.setdefault("decide_mode", [])
 
-    prompt = MODE_DECIDE_PROMPT.format(question=state["original_question"])
-    decision = llm.invoke([HumanMessage(content=prompt)]).content.strip().lower()
-    logs["decide_mode"].append(f"LLM decision: {decision}")
+    question = state["original_question"]
+    if settings.ROUTER_ENABLED:
+        mode, confidence = mode_router.route(question)
+        update = _decide_mode_from_router(state, mode, confidence)
+        if update is not None:
+            mode_router.record(question, mode, source="router", confidence=confidence)
+            return update
+
+    prompt = MODE_DECIDE_PROMPT.format(question=question)
+    update = _decide_mode_from_llm(state, prompt, llm_memo.invoke([HumanMessage(content=prompt)], namespace="decide_mode"))
+    if settings.ROUTER_ENABLED:
+        mode_router.record(question, update["mode"], source="llm")
+    return update
+
+async def adecide_mode(state: GraphState) -> dict:
+    """Async `decide_mode`."""
+    state["trace"].append("decide_mode")
+    logs = state.setdefault("logs", {})
+    logs.setdefault("decide_mode", [])
+
+    question = state["original_question"]
+    if settings.ROUTER_ENABLED:
+        mode, confidence = await mode_router.aroute(question)
+        update = _decide_mode_from_router(state, mode, confidence)
+        if update is not None:
+            await mode_router.arecord(question, mode, source="router", confidence=confidence)
+            return update
 
-    return {"mode": decision}
+    prompt = MODE_DECIDE_PROMPT.format(question=question)
+    update = _decide_mode_from_llm(state, prompt, await llm_memo.ainvoke([HumanMessage(content=prompt)], namespace="decide_mode"))
+    if settings.ROUTER_ENABLED:
+        await mode_router.arecord(question, update["mode"], source="llm")
+    return update
 
 def route_after_decision(state: GraphState) -> Literal["expand_query", "retrieve_documents"]:
     """Router function to direct flow after mode decision."""
@@ -43,44 +106,103 @@ def route_after_decision(state: GraphState) -> Literal["expand_query", "retrieve
         return "expand_query"
     return "retrieve_documents"
 
-def expand_query(state: GraphState) -> dict:
-    """
-    Agent: Expands the original query into multiple related queries for broader search.
-    """
+def _expand_messages(state: GraphState) -> List[BaseMessage]:
     state["trace"].append("expand_query")
     logs = state.setdefault("logs", {})
     logs["expand_query"] = []
-
-    prompt = EXPAND_PROMPT.format(original_question=state["original_question"])
-    expanded_content = llm.invoke([HumanMessage(content=prompt)]).content.strip()
-
-    expanded_queries = [line.strip() for line in expanded_content.split("\n") if line.strip()]
-    logs["expand_query"].extend(expanded_queries)
-
+    if not state.get("final_answer"):
+        return [HumanMessage(content=EXPAND_PROMPT.format(original_question=state["original_question"]))]
+    # A refinement pass sees what was searched and answered, so it asks for different queries
+    # (and the memo key changes with them) instead of repeating the first pass's expansion.
+    return [HumanMessage(content=EXPAND_REFINE_PROMPT.format(
+        original_question=state["original_question"],
+        previous_queries="\n".join(state.get("queries") or [state["original_question"]]),
+        previous_answer=state["final_answer"][:REFINE_ANSWER_EXCERPT_CHARS],
+    ))]
+
+def _expanded_queries(state: GraphState, messages: List[BaseMessage], expanded_content: str) -> dict:
+    expanded_queries = [line.strip() for line in expanded_content.strip().split("\n") if line.strip()]
+    state["logs"]["expand_query"].extend(expanded_queries)
     return {"queries": expanded_queries}
 
-def retrieve_documents(state: GraphState) -> dict:
+def expand_query(state: GraphState) -> dict:
     """
-    Agent: Retrieves and reranks documents based on the queries.
+    Agent: Expands the original query into multiple related queries for broader search.
     """
+    messages = _expand_messages(state)
+    expanded_content = llm_memo.invoke(messages, namespace="expand_query")
+    return _expanded_queries(state, messages, expanded_content)
+
+async def aexpand_query(state: GraphState) -> dict:
+    """Async `expand_query`."""
+    messages = _expand_messages(state)
+    expanded_content = await llm_memo.ainvoke(messages, namespace="expand_query")
+    return _expanded_queries(state, messages, expanded_content)
+
+def _prefetch_query(state: GraphState) -> Optional[str]:
+    # Nothing to prefetch when the user supplied the reference documents.
+    if state.get("reference_docs"):
+        return None
+    return state["original_question"]
+
+def prefetch_documents(state: GraphState) -> dict:
+    """
+    Agent: Speculatively searches the index for the original question while the mode is
+    being decided. Direct mode reuses these hits instead of searching again.
+    """
+    query = _prefetch_query(state)
+    if query is None:
+        return {"prefetched_docs": []}
+    docs = tool_registry.get_tool("faiss_search").run({"queries": [query], "max_results_per_query": 10})
+    state["logs"].setdefault("prefetch_documents", []).append(f"Prefetched {len(docs)} documents.")
+    return {"prefetched_docs": docs}
+
+async def aprefetch_documents(state: GraphState) -> dict:
+    """Async `prefetch_documents`."""
+    query = _prefetch_query(state)
+    if query is None:
+        return {"prefetched_docs": []}
+    docs = await tool_registry.get_tool("faiss_search").arun({"queries": [query], "max_results_per_query": 10})
+    state["logs"].setdefault("prefetch_documents", []).append(f"Prefetched {len(docs)} documents.")
+    return {"prefetched_docs": docs}
+
+def _prefetched_hits(state: GraphState, queries: List[str]) -> Optional[List[dict]]:
+    """The prefetched hits, when they are exactly what searching `queries` would return."""
+    if queries == [state["original_question"]] and state.get("prefetched_docs"):
+        state["logs"]["retrieve_documents"].append("Using prefetched search results.")
+        return state["prefetched_docs"]
+    return None
+
+def _start_retrieval(state: GraphState) -> Optional[dict]:
     state["trace"].append("retrieve_documents")
     logs = state.setdefault("logs", {})
     logs["retrieve_documents"] = []
 
-    tool_registry = AgentToolRegistry()
-
     if state.get("reference_docs"):
         logs["retrieve_documents"].append("Using provided reference documents.")
         return {"retrieved_docs": state["reference_docs"]}
+    return None
+
+def retrieve_documents(state: GraphState) -> dict:
+    """
+    Agent: Retrieves and reranks documents based on the queries.
+    """
+    update = _start_retrieval(state)
+    if update is not None:
+        return update
+    logs = state["logs"]
 
     # If queries aren't expanded, use the original question.
     queries_to_search = state.get("queries") or [state["original_question"]]
 
-    faiss_search_tool = tool_registry.get_tool("faiss_search")
-    internal_docs = faiss_search_tool.run({
-        "queries": queries_to_search,
-        "max_results_per_query": 10,
-    })
+    internal_docs = _prefetched_hits(state, queries_to_search)
+    if internal_docs is None:
+        # Expanded queries are embedded in one call and searched as one matrix.
+        faiss_search_tool = tool_registry.get_tool("faiss_search")
+        internal_docs = faiss_search_tool.run({
+            "queries": queries_to_search,
+            "max_results_per_query": 10,
+        })
 
     if not internal_docs:
         logs["retrieve_documents"].append("No documents found after all searches.")
@@ -96,6 +218,64 @@ def retrieve_documents(state: GraphState) -> dict:
     logs["retrieve_documents"].append(f"Reranking selected {len(top_docs)} documents.")
     return {"retrieved_docs": top_docs}
 
+async def aretrieve_documents(state: GraphState) -> dict:
+    """Async `retrieve_documents`."""
+    update = _start_retrieval(state)
+    if update is not None:
+        return update
+    logs = state["logs"]
+
+    queries_to_search = state.get("queries") or [state["original_question"]]
+
+    internal_docs = _prefetched_hits(state, queries_to_search)
+    if internal_docs is None:
+        internal_docs = await tool_registry.get_tool("faiss_search").arun({
+            "queries": queries_to_search,
+            "max_results_per_query": 10,
+        })
+
+    if not internal_docs:
+        logs["retrieve_documents"].append("No documents found after all searches.")
+        return {"retrieved_docs": []}
+
+    top_docs = await tool_registry.get_tool("document_rerank").arun({
+        "query": state["original_question"],
+        "documents": internal_docs,
+        "top_k": 5
+    })
+
+    logs["retrieve_documents"].append(f"Reranking selected {len(top_docs)} documents.")
+    return {"retrieved_docs": top_docs}
+
+def _finish_answer(state: GraphState, chunks: List[str], completed: bool) -> dict:
+    logs = state["logs"].setdefault("generate_answer", [])
+    answer = "".join(chunks)
+    messages = AnswerGenerationTool._messages(state["original_question"], state["retrieved_docs"], REFERENCE_PROMPT)
+    update = {
+        # Every generated answer is one iteration of the refine loop.
+        "iteration": state["iteration"] + 1,
+        "tokens_used": count_tokens(*(message.content for message in messages), answer),
+    }
+    if completed or not state.get("final_answer"):
+        # A cut-off first answer is still better than none; a cut-off refinement is not.
+        logs.append(f"Generated {'cited' if completed else 'partial'} answer with {len(state['retrieved_docs'])} references.")
+        update["final_answer"] = answer
+    else:
+        logs.append("Answer generation ran out of time, keeping the previous answer.")
+    return update
+
+def _partial_answer(state: GraphState, chunks: List[str]) -> dict:
+    """Timeout fallback of generate_answer: finish with the chunks streamed before the timeout."""
+    if not chunks:
+        return {"iteration": state["iteration"] + 1}
+    return _finish_answer(state, list(chunks), completed=False)
+
+def _answer_stop_at(state: GraphState) -> float:
+    return time.monotonic() + node_timeout(state) * (1 - ANSWER_STOP_MARGIN)
+
+def _stopped_early(state: GraphState) -> None:
+    state["logs"].setdefault("budget", []).append("generate_answer stopped at its time budget")
+
 def generate_answer(state: GraphState) -> dict:
     """
     Agent: Generates a final answer based on the retrieved documents and the original question.
@@ -104,61 +284,156 @@ def generate_answer(state: GraphState) -> dict:
     logs = state.setdefault("logs", {})
     logs.setdefault("generate_answer", [])
 
-    tool_registry = AgentToolRegistry()
     answer_tool = tool_registry.get_tool("answer_generation")
-    cited_answer = answer_tool.run({
-        "query": state["original_question"],
-        "reference_docs": state["retrieved_docs"]
-    })
 
-    logs["generate_answer"].append(f"Generated cited answer with {len(state['retrieved_docs'])} references.")
+    # Tokens go out on the graph's "custom" stream as they arrive; callers that only
+    # invoke the graph simply get the joined answer.
+    writer = get_stream_writer()
+    writer({"type": "answer_start"})
+    chunks = []
+    # Stop streaming just before the node's time budget and keep what arrived so far; if a
+    # chunk arrives too late for that, the timeout fallback still gets the chunks from here.
+    keep_partial(chunks)
+    stop_at = _answer_stop_at(state)
+    completed = True
+    for chunk in answer_tool.stream(state["original_question"], state["retrieved_docs"]):
+        chunks.append(chunk)
+        writer({"type": "token", "text": chunk})
+        if time.monotonic() >= stop_at:
+            completed = False
+            _stopped_early(state)
+            break
+
+    return _finish_answer(state, chunks, completed)
+
+async def agenerate_answer(state: GraphState) -> dict:
+    """Async `generate_answer`."""
+    state["trace"].append("generate_answer")
+    logs = state.setdefault("logs", {})
+    logs.setdefault("generate_answer", [])
 
-    return {"final_answer": cited_answer}
+    answer_tool = tool_registry.get_tool("answer_generation")
 
-def decide_next_step(state: GraphState) -> Literal["expand_query", "END"]:
-    """
-    Agent: Decides whether to continue iterating for a better answer or to finish.
-    """
+    writer = get_stream_writer()
+    writer({"type": "answer_start"})
+    chunks = []
+    # Stop streaming just before the node's time budget and keep what arrived so far; if a
+    # chunk arrives too late for that, the timeout fallback still gets the chunks from here.
+    keep_partial(chunks)
+    stop_at = _answer_stop_at(state)
+    completed = True
+    async for chunk in answer_tool.astream(state["original_question"], state["retrieved_docs"]):
+        chunks.append(chunk)
+        writer({"type": "token", "text": chunk})
+        if time.monotonic() >= stop_at:
+            completed = False
+            _stopped_early(state)
+            break
+
+    return _finish_answer(state, chunks, completed)
+
+def _decision_args(state: GraphState) -> dict:
     state["trace"].append("decide_next_step")
     logs = state.setdefault("logs", {})
     logs.setdefault("decide_next_step", [])
-
-    tool_registry = AgentToolRegistry()
-    decision_tool = tool_registry.get_tool("decision_maker")
-    decision_result = decision_tool.run({
+    return {
         "answer": state["final_answer"],
         "iteration": state["iteration"],
         "max_iterations": MAX_ITERATIONS
-    })
+    }
 
-    logs["decide_next_step"].append(f"Decision: {decision_result}")
+def _next_step(state: GraphState, decision_result: dict) -> dict:
+    state["logs"]["decide_next_step"].append(f"Decision: {decision_result}")
 
     if decision_result["continue"]:
-        print(f"--- Iteration {state['iteration'] + 1}: Refining answer ---")
-        return "expand_query"
-    
-    return END
+        logger.info(f"[Graph] Iteration {state['iteration'] + 1}: refining answer")
+        return {"next_step": "expand_query"}
+
+    return {"next_step": END}
+
+def _out_of_budget(state: GraphState) -> bool:
+    reason = budget_exhausted(state)
+    if reason is None:
+        return False
+    state["logs"].setdefault("budget", []).append(f"Stopping with the best answer so far: {reason} exhausted")
+    return True
+
+def _stop_refining(state: GraphState) -> bool:
+    logs = state["logs"]["decide_next_step"]
+    if not state.get("final_answer"):
+        logs.append("No answer to refine, stopping.")
+        return True
+    if state["logs"].get("budget"):
+        # Another pass would run into the same limits and could only keep the current answer.
+        logs.append("A step ran out of time, stopping with the answer so far.")
+        return True
+    return _out_of_budget(state)
+
+def decide_next_step(state: GraphState) -> dict:
+    """
+    Agent: Decides whether to continue iterating for a better answer or to finish.
+    A node rather than a conditional edge, so the decision call is charged to the token budget.
+    """
+    args = _decision_args(state)
+    if _stop_refining(state):
+        return {"next_step": END}
+    decision_tool = tool_registry.get_tool("decision_maker")
+    return _next_step(state, decision_tool.run(args))
+
+async def adecide_next_step(state: GraphState) -> dict:
+    """Async `decide_next_step`."""
+    args = _decision_args(state)
+    if _stop_refining(state):
+        return {"next_step": END}
+    decision_tool = tool_registry.get_tool("decision_maker")
+    return _next_step(state, await decision_tool.arun(args))
+
+def route_after_next_step(state: GraphState) -> Literal["expand_query", "END"]:
+    return "expand_query" if state.get("next_step") == "expand_query" else END
 
 
 def create_graph() -> StateGraph:
+    """
+    Build the agent graph. Every node has a sync and an async implementation, so the
+    compiled graph can be driven with invoke/stream or with ainvoke/astream. Each node
+    is bounded by the per-node timeout and the request deadline (see core/budget.py).
+    """
     graph = StateGraph(GraphState)
     
-    graph.add_node("decide_mode", decide_mode)
-    graph.add_node("expand_query", expand_query)
-    graph.add_node("retrieve_documents", retrieve_documents)
-    graph.add_node("generate_answer", generate_answer)
+    graph.add_node("decide_mode", budgeted_node(
+        "decide_mode", decide_mode, adecide_mode, lambda state: {"mode": "direct"}))
+    graph.add_node("prefetch_documents", budgeted_node(
+        "prefetch_documents", prefetch_documents, aprefetch_documents, lambda state: {"prefetched_docs": []}))
+    graph.add_node("expand_query", budgeted_node(
+        "expand_query", expand_query, aexpand_query, lambda state: {"queries": [state["original_question"]]}))
+    graph.add_node("retrieve_documents", budgeted_node(
+        "retrieve_documents", retrieve_documents, aretrieve_documents,
+        lambda state: {"retrieved_docs": state.get("reference_docs") or state.get("prefetched_docs", [])[:5]}))
+    graph.add_node("generate_answer", budgeted_node(
+        "generate_answer", generate_answer, agenerate_answer, lambda state: {"iteration": state["iteration"] + 1},
+        partial_fallback=_partial_answer))
+    graph.add_node("decide_next_step", budgeted_node(
+        "decide_next_step", decide_next_step, adecide_next_step, lambda state: {"next_step": END}))
 
     graph.add_edge("expand_query", "retrieve_documents")
     graph.add_edge("retrieve_documents", "generate_answer")
+    graph.add_edge("generate_answer", "decide_next_step")
     
     graph.add_conditional_edges(
         "decide_mode",
         route_after_decision,
         {"expand_query": "expand_query", "retrieve_documents": "retrieve_documents"}
     )
-    graph.add_conditional_edges("generate_answer", decide_next_step, {"expand_query": "expand_query", END: END})
+    graph.add_conditional_edges(
+        "decide_next_step",
+        route_after_next_step,
+        {"expand_query": "expand_query", END: END}
+    )
     
+    # The mode decision and the speculative search run in the same step, so the
+    # prefetched hits are already in the state when retrieval starts.
     graph.add_edge(START, "decide_mode")
+    graph.add_edge(START, "prefetch_documents")
     return graph.compile()
 
 def build_initial_graph_state(query: str) -> GraphState:
@@ -171,9 +446,177 @@ def build_initial_graph_state(query: str) -> GraphState:
         "final_answer": "",
         "similarities": [],
         "retrieved_docs": [],
+        "prefetched_docs": [],
         "logs": {},
+        "deadline": 0.0,
+        "tokens_used": 0,
+        "next_step": END,
     }
 
+def _cache_applies(state: GraphState) -> bool:
+    return settings.ANSWER_CACHE_ENABLED and not state.get("reference_docs")
+
+def _cache_lookup(state: GraphState) -> Tuple[Optional[Tuple[Any, Any]], Optional[dict]]:
+    """
+    Return ((query vector, index version), cached final state); both None when the cache does
+    not apply. The version is read before the graph runs, so a new answer is stored under the
+    index it was retrieved from.
+    """
+    if not _cache_applies(state):
+        return None, None
+    with span("answer_cache", "cache") as cache_span:
+        query_vector = embedding_model.get_embeddings_array([state["original_question"]])[0]
+        version = answer_cache.version()
+        cached = _cached_state(state, answer_cache.get(query_vector, version))
+        cache_span.set(cache_hit=cached is not None)
+    return (query_vector, version), cached
+
+async def _acache_lookup(state: GraphState) -> Tuple[Optional[Tuple[Any, Any]], Optional[dict]]:
+    if not _cache_applies(state):
+        return None, None
+    with span("answer_cache", "cache") as cache_span:
+        query_vector = (await embedding_model.aget_embeddings_array([state["original_question"]]))[0]
+        version = await answer_cache.aversion()
+        cached = _cached_state(state, answer_cache.get(query_vector, version))
+        cache_span.set(cache_hit=cached is not None)
+    return (query_vector, version), cached
+
+def _cached_state(state: GraphState, cached: Optional[dict]) -> Optional[dict]:
+    if cached is None:
+        return None
+    return {
+        **state,
+        "trace": state["trace"] + ["answer_cache"],
+        "logs": {**state["logs"], "answer_cache": ["Answered from semantic answer cache."]},
+        "final_answer": cached["final_answer"],
+        "retrieved_docs": cached["retrieved_docs"],
+    }
+
+def _cache_store(cache_key: Optional[Tuple[Any, Any]], final_state: dict) -> None:
+    if cache_key is None or not final_state.get("final_answer"):
+        return
+    if final_state.get("logs", {}).get("budget"):
+        # A step timed out or fell back; don't serve a degraded answer to every similar question.
+        return
+    query_vector, version = cache_key
+    answer_cache.set(query_vector, {
+        "final_answer": final_state["final_answer"],
+        "retrieved_docs": final_state.get("retrieved_docs", []),
+    }, version)
+
+def _with_spans(final_state: dict, trace: Optional[Trace]) -> dict:
+    """Attach the request's span records to the final state, for the UI timeline and load reports."""
+    if trace is None:
+        return final_state
+    return {**final_state, "spans": trace.records()}
+
+def run_graph(graph, state: GraphState) -> dict:
+    """
+    Invoke the graph, answering from the semantic answer cache when a near-identical
+    question was already answered against the current index. Questions asked with
+    user-selected reference documents always run the full graph.
+    """
+    with start_trace("graph", question=state["original_question"]) as trace:
+        final_state = _run_graph(graph, state)
+    return _with_spans(final_state, trace)
+
+def _run_graph(graph, state: GraphState) -> dict:
+    start_budget(state)
+    cache_key, cached = _cache_lookup(state)
+    if cached is not None:
+        return cached
+
+    final_state = graph.invoke(state)
+    _cache_store(cache_key, final_state)
+    return final_state
+
+def stream_graph(graph, state: GraphState) -> Iterator[Tuple[str, Any]]:
+    """
+    Like `run_graph`, but yields progress while the graph runs:
+    ("node", name) when a node finishes, ("answer_start", None) when an answer
+    starts generating, ("token", text) for each answer chunk, and finally
+    ("final", final_state).
+    """
+    final_state = state
+    with start_trace("graph", question=state["original_question"]) as trace:
+        for event, payload in _stream_graph(graph, state):
+            if event == "final":
+                final_state = payload
+            else:
+                yield event, payload
+    yield "final", _with_spans(final_state, trace)
+
+def _stream_graph(graph, state: GraphState) -> Iterator[Tuple[str, Any]]:
+    start_budget(state)
+    cache_key, cached = _cache_lookup(state)
+    if cached is not None:
+        yield "final", cached
+        return
+
+    final_state = state
+    for mode, chunk in graph.stream(state, stream_mode=["updates", "custom", "values"]):
+        if mode == "values":
+            final_state = chunk
+        else:
+            yield from _stream_events(mode, chunk)
+
+    _cache_store(cache_key, final_state)
+    yield "final", final_state
+
+def _stream_events(mode: str, chunk: Any) -> Iterator[Tuple[str, Any]]:
+    if mode == "updates":
+        for node in chunk:
+            yield "node", node
+    elif chunk.get("type") == "token":
+        yield "token", chunk["text"]
+    elif chunk.get("type") == "answer_start":
+        yield "answer_start", None
+
+async def arun_graph(graph, state: GraphState) -> dict:
+    """Async `run_graph`: drives the graph with `ainvoke` so one worker can serve many questions."""
+    with start_trace("graph", question=state["original_question"]) as trace:
+        final_state = await _arun_graph(graph, state)
+    return _with_spans(final_state, trace)
+
+async def _arun_graph(graph, state: GraphState) -> dict:
+    start_budget(state)
+    cache_key, cached = await _acache_lookup(state)
+    if cached is not None:
+        return cached
+
+    final_state = await graph.ainvoke(state)
+    _cache_store(cache_key, final_state)
+    return final_state
+
+async def astream_graph(graph, state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    """Async `stream_graph`, driven with `astream`."""
+    final_state = state
+    with start_trace("graph", question=state["original_question"]) as trace:
+        async for event, payload in _astream_graph(graph, state):
+            if event == "final":
+                final_state = payload
+            else:
+                yield event, payload
+    yield "final", _with_spans(final_state, trace)
+
+async def _astream_graph(graph, state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    start_budget(state)
+    cache_key, cached = await _acache_lookup(state)
+    if cached is not None:
+        yield "final", cached
+        return
+
+    final_state = state
+    async for mode, chunk in graph.astream(state, stream_mode=["updates", "custom", "values"]):
+        if mode == "values":
+            final_state = chunk
+        else:
+            for event in _stream_events(mode, chunk):
+                yield event
+
+    _cache_store(cache_key, final_state)
+    yield "final", final_state
+
 if __name__ == "__main__":
     query = "What are the latest advancements in AI?"
     state = build_initial_graph_state(query)
@@ -16,6 +16,21 @@ You are an academic assistant that reads the given text and outputs 2-3 broad an
 Return only the tags, separated by commas. Do NOT include explanations or any extra text.
 """
 
+ENRICH_PROMPT = """
+You are an academic assistant. Read a single document and return its summary and topic tags.
+
+Summary instructions:
+- If the document is short, provide a concise summary in one sentence.
+- If the document covers multiple key ideas, present them as a bulleted list.
+- Do **not** begin with generic phrases like "This document is about...".
+- Focus solely on the core content, highlighting the most important insights.
+
+Tags instructions:
+- Provide 2-3 broad and commonly used academic topic tags.
+
+Respond with ONLY a JSON object of the form {{"summary": "...", "tags": ["...", "..."]}}.
+"""
+
 #============================
 # Agent Prompts
 #============================
@@ -56,6 +71,24 @@ Write four versions of this question:
 Format as four lines, one question per line, no extra comments.
 """
 
+EXPAND_REFINE_PROMPT = """You are a research assistant improving the answer to a user’s question.
+The previous search did not produce a good enough answer.
+
+Original Question:
+{original_question}
+
+Queries already searched:
+{previous_queries}
+
+Current answer (excerpt):
+{previous_answer}
+
+Write four versions of this question:
+- First, the original question as is.
+- Then, three new queries that target what the current answer is missing. Do not repeat the queries already searched.
+Format as four lines, one question per line, no extra comments.
+"""
+
 
 RERANK_PROMPT = """
 You are a helpful assistant skilled in semantic understanding. Your task is to identify the top 5 most relevant documents to help answer a user's question.
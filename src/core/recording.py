@@ -0,0 +1,255 @@
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Callable, Awaitable, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from logger import logger
+from utils.sqlite_cache import SQLiteCache
+from .config import settings
+from .standin_models import StandinChatModel, StandinEmbeddings
+
+
+class ProviderRecording:
+    """
+    Provider replies recorded from real calls (MODEL_PROVIDER=record) and served back
+    in load tests (MODEL_PROVIDER=replay), keyed by a hash of the request. Each entry
+    keeps the reply and how long the provider took to produce it.
+    """
+
+    def __init__(self, path: str = settings.PROVIDER_RECORDING_PATH,
+                 max_entries: int = settings.PROVIDER_RECORDING_MAX_ENTRIES):
+        self.store = SQLiteCache(path, max_entries, table="recordings")
+        self.misses = 0
+        self._warned = False
+
+    @staticmethod
+    def key(kind: str, payload: Any) -> str:
+        data = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return f"{kind}:{hashlib.sha256(data.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+            if not self._warned:
+                self._warned = True
+                logger.warning("[ProviderRecording] Request was never recorded, answering with the stand-in model")
+            return None
+        return json.loads(value)
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {key: json.loads(value) for key, value in self.store.get_many(keys).items()}
+        missing = len(set(keys) - found.keys())
+        if missing:
+            self.misses += missing
+            if not self._warned:
+                self._warned = True
+                logger.warning("[ProviderRecording] Texts were never recorded, embedding them with the stand-in model")
+        return found
+
+    def put(self, key: str, record: dict) -> None:
+        self.store.set(key, json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def put_many(self, records: dict) -> None:
+        self.store.set_many({key: json.dumps(record).encode("utf-8") for key, record in records.items()})
+
+    def stats(self) -> dict:
+        return {**self.store.stats(), "replay_misses": self.misses}
+
+
+def _messages_key(messages: List[BaseMessage]) -> str:
+    return ProviderRecording.key("chat", [[message.type, message.content] for message in messages])
+
+
+class RecordReplayChatModel(BaseChatModel):
+    """
+    Chat model for MODEL_PROVIDER=record|replay. In record mode every call goes to `model`
+    and its reply and latency are stored; in replay mode the recorded reply is returned after
+    the recorded latency (when `replay_latency` is set), without any provider access.
+    """
+
+    mode: str
+    recording: Any
+    model: Any = None
+    fallback: Any = None
+    replay_latency: bool = settings.PROVIDER_REPLAY_LATENCY
+    model_name: str = "replay-chat"
+
+    @property
+    def _llm_type(self) -> str:
+        return f"{self.mode}-chat"
+
+    def _record(self, messages: List[BaseMessage], reply: str, latency: float, first_token: float) -> None:
+        self.recording.put(_messages_key(messages), {"reply": reply, "latency": latency, "first_token": first_token})
+
+    def _replayed(self, messages: List[BaseMessage]) -> dict:
+        record = self.recording.get(_messages_key(messages))
+        if record is None:
+            self.fallback = self.fallback or StandinChatModel()
+            return {"reply": self.fallback.reply(messages), "latency": 0.0, "first_token": 0.0}
+        if not self.replay_latency:
+            record.update(latency=0.0, first_token=0.0)
+        return record
+
+    @staticmethod
+    def _tokens(reply: str) -> List[str]:
+        return StandinChatModel._tokens(reply)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.mode == "record":
+            started = time.perf_counter()
+            reply = self.model.invoke(messages, **kwargs).content
+            latency = time.perf_counter() - started
+            self._record(messages, reply, latency, latency)
+        else:
+            record = self._replayed(messages)
+            time.sleep(record["latency"])
+            reply = record["reply"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.mode == "record":
+            started = time.perf_counter()
+            reply = (await self.model.ainvoke(messages, **kwargs)).content
+            latency = time.perf_counter() - started
+            self._record(messages, reply, latency, latency)
+        else:
+            record = self._replayed(messages)
+            await asyncio.sleep(record["latency"])
+            reply = record["reply"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.mode == "record":
+            started = time.perf_counter()
+            first_token, parts = None, []
+            for chunk in self.model.stream(messages, **kwargs):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(chunk.content)
+                yield self._chunk(chunk.content, run_manager)
+            self._record(messages, "".join(parts), time.perf_counter() - started, first_token or 0.0)
+            return
+
+        record = self._replayed(messages)
+        tokens = self._tokens(record["reply"])
+        time.sleep(record["first_token"])
+        # The rest of the recorded time is spread evenly over the remaining tokens.
+        delay = max(0.0, record["latency"] - record["first_token"]) / max(len(tokens) - 1, 1)
+        for i, token in enumerate(tokens):
+            if i and delay:
+                time.sleep(delay)
+            yield self._chunk(token, run_manager)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.mode == "record":
+            started = time.perf_counter()
+            first_token, parts = None, []
+            async for chunk in self.model.astream(messages, **kwargs):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(chunk.content)
+                yield await self._achunk(chunk.content, run_manager)
+            self._record(messages, "".join(parts), time.perf_counter() - started, first_token or 0.0)
+            return
+
+        record = self._replayed(messages)
+        tokens = self._tokens(record["reply"])
+        await asyncio.sleep(record["first_token"])
+        delay = max(0.0, record["latency"] - record["first_token"]) / max(len(tokens) - 1, 1)
+        for i, token in enumerate(tokens):
+            if i and delay:
+                await asyncio.sleep(delay)
+            yield await self._achunk(token, run_manager)
+
+    @staticmethod
+    def _chunk(content: str, run_manager: Any) -> ChatGenerationChunk:
+        chunk = ChatGenerationChunk(message=AIMessageChunk(content=content))
+        if run_manager:
+            run_manager.on_llm_new_token(content, chunk=chunk)
+        return chunk
+
+    @staticmethod
+    async def _achunk(content: str, run_manager: Any) -> ChatGenerationChunk:
+        chunk = ChatGenerationChunk(message=AIMessageChunk(content=content))
+        if run_manager:
+            await run_manager.on_llm_new_token(content, chunk=chunk)
+        return chunk
+
+
+class RecordReplayEmbeddings(Embeddings):
+    """
+    Embeddings for MODEL_PROVIDER=record|replay, recorded per text. `embed` and `aembed`
+    call the real provider in record mode; replay returns the recorded vectors after the
+    recorded request latency, and stand-in vectors for texts that were never recorded.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        recording: ProviderRecording,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        aembed: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None,
+        replay_latency: bool = settings.PROVIDER_REPLAY_LATENCY,
+    ):
+        self.mode = mode
+        self.recording = recording
+        self.embed = embed
+        self.aembed = aembed
+        self.replay_latency = replay_latency
+        self.fallback: Optional[StandinEmbeddings] = None
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return ProviderRecording.key("embedding", text)
+
+    def _record(self, texts: List[str], vectors: List[List[float]], latency: float) -> None:
+        self.recording.put_many({
+            self._key(text): {"vector": [float(value) for value in vector], "latency": latency}
+            for text, vector in zip(texts, vectors)
+        })
+
+    def _replayed(self, texts: List[str]) -> tuple:
+        keys = [self._key(text) for text in texts]
+        found = self.recording.get_many(keys)
+        missing = [text for text, key in zip(texts, keys) if key not in found]
+        fallback_vectors = {}
+        if missing:
+            self.fallback = self.fallback or StandinEmbeddings()
+            fallback_vectors = dict(zip(missing, self.fallback.embed_array(missing).tolist()))
+        vectors = [found[key]["vector"] if key in found else fallback_vectors[text] for text, key in zip(texts, keys)]
+        latency = max((record["latency"] for record in found.values()), default=0.0) if self.replay_latency else 0.0
+        return vectors, latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.mode == "record":
+            started = time.perf_counter()
+            vectors = self.embed(texts)
+            self._record(texts, vectors, time.perf_counter() - started)
+            return vectors
+        vectors, latency = self._replayed(texts)
+        time.sleep(latency)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.mode == "record":
+            started = time.perf_counter()
+            vectors = await self.aembed(texts)
+            self._record(texts, vectors, time.perf_counter() - started)
+            return vectors
+        vectors, latency = self._replayed(texts)
+        await asyncio.sleep(latency)
+        return vectors
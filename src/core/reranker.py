@@ -0,0 +1,118 @@
+import asyncio
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import numpy as np
+
+from logger import logger
+from .config import settings
+from .model import embedding_model
+from .index_store import IndexSnapshot
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _indexed_vectors(documents: List[dict], snapshot: Optional[IndexSnapshot]) -> List[Optional[np.ndarray]]:
+    vectors: List[Optional[np.ndarray]] = [None] * len(documents)
+    if snapshot is not None:
+        for position, doc in enumerate(documents):
+            vector_id = doc.get("vector_id")
+            if vector_id is None:
+                continue
+            try:
+                vectors[position] = snapshot.reconstruct(int(vector_id))
+            except RuntimeError:
+                # Not in this index (removed or re-chunked since it was retrieved).
+                pass
+    return vectors
+
+
+def document_vectors(documents: List[dict], snapshot: Optional[IndexSnapshot]) -> np.ndarray:
+    """
+    Vectors for `documents`, read back from the FAISS index by vector id. Documents
+    without a vector id in the current index (e.g. user-selected references from an
+    older build) are embedded instead, which hits the embedding cache.
+    """
+    vectors = _indexed_vectors(documents, snapshot)
+    missing = [position for position, vector in enumerate(vectors) if vector is None]
+    if missing:
+        embedded = embedding_model.get_embeddings_array([documents[p].get("page_content", "") for p in missing])
+        for position, vector in zip(missing, embedded):
+            vectors[position] = vector
+    return np.vstack(vectors).astype(np.float32)
+
+
+async def adocument_vectors(documents: List[dict], snapshot: Optional[IndexSnapshot]) -> np.ndarray:
+    """Async `document_vectors`."""
+    vectors = _indexed_vectors(documents, snapshot)
+    missing = [position for position, vector in enumerate(vectors) if vector is None]
+    if missing:
+        embedded = await embedding_model.aget_embeddings_array([documents[p].get("page_content", "") for p in missing])
+        for position, vector in zip(missing, embedded):
+            vectors[position] = vector
+    return np.vstack(vectors).astype(np.float32)
+
+
+@lru_cache(maxsize=2)
+def _cross_encoder(model_name: str) -> Any:
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device=settings.DEVICE)
+
+
+def cross_encoder_scores(query: str, documents: List[dict]) -> Optional[np.ndarray]:
+    """Relevance in (0, 1) from a CPU cross-encoder, or None if it is not installed or fails to load."""
+    try:
+        model = _cross_encoder(settings.RERANK_CROSS_ENCODER_MODEL)
+    except Exception as e:
+        logger.warning(f"[Reranker] Cross-encoder unavailable ({e}), using embedding similarity")
+        return None
+    logits = model.predict([(query, doc.get("page_content", "")) for doc in documents])
+    return 1 / (1 + np.exp(-np.asarray(logits, dtype=np.float32)))
+
+
+def mmr_select(query_vector: np.ndarray, doc_vectors: np.ndarray, top_k: int,
+               lambda_mult: float = settings.RERANK_MMR_LAMBDA,
+               relevance: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick documents that are relevant to the query
+    but dissimilar to those already picked. `relevance` overrides the query cosine.
+    """
+    doc_vectors = _normalize(doc_vectors)
+    similarity_to_query = doc_vectors @ _normalize(query_vector.reshape(-1))
+    if relevance is None:
+        relevance = similarity_to_query
+    pairwise = doc_vectors @ doc_vectors.T
+
+    selected: List[int] = []
+    candidates = list(range(len(doc_vectors)))
+    while candidates and len(selected) < top_k:
+        if selected:
+            redundancy = pairwise[np.ix_(candidates, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(candidates), dtype=np.float32)
+        scores = lambda_mult * relevance[candidates] - (1 - lambda_mult) * redundancy
+        best = candidates[int(np.argmax(scores))]
+        selected.append(best)
+        candidates.remove(best)
+    return selected
+
+
+def local_rerank(query: str, documents: List[dict], top_k: int, snapshot: Optional[IndexSnapshot],
+                 use_cross_encoder: bool = False) -> List[dict]:
+    """Rerank in-process by embedding similarity (or cross-encoder relevance) with MMR diversity."""
+    query_vector = embedding_model.get_embeddings_array([query])[0]
+    doc_vectors = document_vectors(documents, snapshot)
+    relevance = cross_encoder_scores(query, documents) if use_cross_encoder else None
+    return [documents[i] for i in mmr_select(query_vector, doc_vectors, top_k, relevance=relevance)]
+
+
+async def alocal_rerank(query: str, documents: List[dict], top_k: int, snapshot: Optional[IndexSnapshot],
+                        use_cross_encoder: bool = False) -> List[dict]:
+    """Async `local_rerank`; embedding calls are awaited and the cross-encoder runs in a thread."""
+    query_vector, doc_vectors = await asyncio.gather(
+        embedding_model.aget_embeddings_array([query]), adocument_vectors(documents, snapshot)
+    )
+    relevance = await asyncio.to_thread(cross_encoder_scores, query, documents) if use_cross_encoder else None
+    return [documents[i] for i in mmr_select(query_vector[0], doc_vectors, top_k, relevance=relevance)]
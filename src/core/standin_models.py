@@ -0,0 +1,175 @@
+import re
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+from collections import Counter
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .config import settings
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "the", "and", "for", "that", "with", "this", "are", "was", "from", "have", "has", "not", "but",
+    "you", "your", "can", "all", "our", "its", "they", "their", "which", "what", "how", "into",
+}
+
+
+def _keywords(text: str, count: int) -> List[str]:
+    words = [word for word in _WORD.findall(text.lower()) if len(word) > 3 and word not in _STOPWORDS]
+    return [word for word, _ in Counter(words).most_common(count)]
+
+
+class StandinChatModel(BaseChatModel):
+    """
+    Deterministic, local stand-in for the chat LLM, used by the benchmarks and load tests
+    (MODEL_PROVIDER=standin). Replies are derived from the prompt, in the shape each
+    prompt in core/prompt.py asks for, after a configurable delay per call and per token.
+    """
+
+    model_name: str = "standin-chat"
+    latency_seconds: float = settings.STANDIN_LLM_LATENCY_SECONDS
+    token_latency_seconds: float = settings.STANDIN_LLM_TOKEN_LATENCY_SECONDS
+
+    @property
+    def _llm_type(self) -> str:
+        return "standin-chat"
+
+    def reply(self, messages: List[BaseMessage]) -> str:
+        text = "\n".join(str(message.content) for message in messages)
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+        if "mode classifier" in text:
+            return "explore" if seed % 2 else "direct"
+        if "continue iterating" in text:
+            return "YES" if seed % 3 == 0 else "NO"
+        if "Write four versions of this question" in text:
+            match = re.search(r"Original Question:\s*\n(.+)", text)
+            question = match.group(1).strip() if match else text.strip().splitlines()[-1]
+            topic = question.rstrip("?")
+            return "\n".join([
+                question,
+                f"What are the main approaches to {topic}?",
+                f"What recent research exists on {topic}?",
+                f"What are the open problems in {topic}?",
+            ])
+        if "most relevant documents" in text:
+            count = len(re.findall(r"^\[\d+\]", text, re.MULTILINE)) or 5
+            return ", ".join(str(i) for i in range(1, min(count, 5) + 1))
+        if "summary and topic tags" in text:
+            content = str(messages[-1].content)
+            return json.dumps({"summary": " ".join(content.split()[:40]), "tags": _keywords(content, 3)})
+        if "[Doc: " in text:
+            return self._answer(text)
+        return " ".join(str(messages[-1].content).split()[:40])
+
+    @staticmethod
+    def _answer(text: str) -> str:
+        """A REFERENCE_PROMPT-shaped answer citing every reference document."""
+        question = text.rsplit("Question:", 1)[-1].strip()
+        documents = re.split(r"\[Doc: \d+\]", text)[1:]
+        paragraphs = []
+        for i, document in enumerate(documents, start=1):
+            keywords = ", ".join(_keywords(document, 4)) or "the reference material"
+            paragraphs.append(f"Document {i} discusses **{keywords}** in relation to the question.[^{i}]")
+        footnotes = [f"[^{i}]: [Document {i}](#doc{i})" for i in range(1, len(documents) + 1)]
+        return "\n\n".join([
+            "### 📌 TL;DR",
+            f"> The references address: {question}",
+            "#### Detailed Answer",
+            *paragraphs,
+            "\n".join(footnotes),
+            "#### 💡 Follow-up Questions",
+            f"> #### What are the limitations of these approaches?\n> #### How do the sources compare on {question.rstrip('?')}?",
+        ])
+
+    @staticmethod
+    def _tokens(reply: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", reply) or [reply]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        reply = self.reply(messages)
+        time.sleep(self.latency_seconds + self.token_latency_seconds * len(self._tokens(reply)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        reply = self.reply(messages)
+        await asyncio.sleep(self.latency_seconds + self.token_latency_seconds * len(self._tokens(reply)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_seconds)
+        for token in self._tokens(self.reply(messages)):
+            if self.token_latency_seconds:
+                time.sleep(self.token_latency_seconds)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_seconds)
+        for token in self._tokens(self.reply(messages)):
+            if self.token_latency_seconds:
+                await asyncio.sleep(self.token_latency_seconds)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class StandinEmbeddings(Embeddings):
+    """
+    Deterministic, local stand-in for the embedding model (MODEL_PROVIDER=standin).
+
+    Each word is hashed to a row of a fixed random projection and a text embeds as the
+    normalized sum of its words' rows, so texts sharing words land close together and
+    searches return sensible neighbours. Every request waits `latency_seconds`.
+    """
+
+    def __init__(
+        self,
+        dim: int = settings.STANDIN_EMBEDDING_DIM,
+        latency_seconds: float = settings.STANDIN_EMBEDDING_LATENCY_SECONDS,
+        buckets: int = 4096,
+        max_words: int = 256,
+    ):
+        self.dim = dim
+        self.latency_seconds = latency_seconds
+        self.buckets = buckets
+        self.max_words = max_words
+        self.model_name = f"standin-embedding-{dim}"
+        self._projection = np.random.default_rng(0).standard_normal((buckets, dim)).astype(np.float32)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = _WORD.findall(text.lower())[:self.max_words] or [""]
+            rows = [zlib.crc32(word.encode("utf-8")) % self.buckets for word in words]
+            vector = self._projection[rows].sum(axis=0)
+            vectors[i] = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return self.embed_array(texts).tolist()
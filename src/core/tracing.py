@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from logger import logger
+from .config import settings
+
+
+class Span:
+    """One timed operation: a graph node, tool call, LLM call, embedding call or FAISS search."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes)
+        self.status = "ok"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float) -> None:
+        """Accumulate a counter attribute, e.g. tokens over a streamed reply."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_record(self) -> dict:
+        """OpenTelemetry-style span record."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class _NoopSpan:
+    """Returned when no trace is active, so instrumented code never has to check."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def add(self, key: str, value: float) -> None:
+        pass
+
+
+class Trace:
+    """Spans collected for one request, in start order."""
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def records(self) -> List[dict]:
+        with self._lock:
+            return [span.to_record() for span in self.spans]
+
+    def export_jsonl(self, path: str, max_bytes: int = settings.TRACE_EXPORT_MAX_BYTES) -> None:
+        """
+        Append every span of this trace to a JSONL file, one record per line. Once the file
+        reaches `max_bytes` it is moved to `<path>.1`, replacing the previous one.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with _export_lock:
+            if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+                os.replace(path, path + ".1")
+            with open(path, 'a', encoding='utf-8') as f:
+                for record in self.records():
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+_NOOP_SPAN = _NoopSpan()
+_export_lock = threading.Lock()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """
+    Collect every span started in this context (and in tasks or threads that copy it) into
+    one trace under a root span. The finished trace is appended to TRACE_EXPORT_PATH, if set.
+    Yields None when tracing is disabled.
+    """
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+    trace = Trace(name)
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(name, "request", **attributes):
+            yield trace
+    finally:
+        try:
+            _current_trace.reset(trace_token)
+        except ValueError:
+            # A streaming generator closed from another context; the trace is still complete.
+            pass
+        if settings.TRACE_EXPORT_PATH:
+            try:
+                trace.export_jsonl(settings.TRACE_EXPORT_PATH)
+            except OSError as e:
+                logger.warning(f"[Tracing] Could not export trace: {e}")
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Any]:
+    """Time the enclosed block as a child of the current span, if a trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+    parent = _current_span.get()
+    current = Span(trace.trace_id, parent.span_id if parent else None, name, kind, attributes)
+    trace._add(current)
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(span_token)
+        except ValueError:
+            pass
+
+
+def traced(name: str, kind: str = "internal") -> Callable:
+    """Decorator form of `span` for sync and async functions."""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
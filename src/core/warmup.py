@@ -0,0 +1,53 @@
+import time
+import threading
+from typing import Optional
+
+from logger import logger
+from .config import settings
+from .budget import count_tokens
+from .index_store import index_store
+from .mode_router import mode_router
+from .model import embedding_model, get_llm
+
+WARMUP_QUESTION = "What is this collection about?"
+
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def warm_up() -> None:
+    """
+    Load everything the first request would otherwise pay for: the index snapshot, the
+    embedding model, the router centroids, the tokenizer and the LLM client.
+    """
+    steps = [
+        ("index", index_store.snapshot),
+        ("embedding model", embedding_model.load),
+        ("tokenizer", lambda: count_tokens(WARMUP_QUESTION)),
+        ("llm client", get_llm),
+    ]
+    if settings.ROUTER_ENABLED:
+        # Embeds the router's labelled examples once; they are cached from then on.
+        steps.append(("mode router", lambda: mode_router.score(WARMUP_QUESTION)))
+
+    started = time.perf_counter()
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # The request path loads the same thing again and reports the error there.
+            logger.warning(f"[Warmup] Could not load {name}: {e}")
+            continue
+        logger.info(f"[Warmup] Loaded {name} in {time.perf_counter() - step_started:.2f}s")
+    logger.info(f"[Warmup] Done in {time.perf_counter() - started:.2f}s")
+
+
+def start_warm_up() -> threading.Thread:
+    """Run `warm_up` once per process in a daemon thread; later calls return the same thread."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+            _thread.start()
+    return _thread
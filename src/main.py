@@ -2,10 +2,14 @@ import streamlit as st
 from ui.home import main_content
 from ui.instruction import instruction_page
 from core.config import settings
+from core.warmup import start_warm_up
 
 def main():
     """Main function to run the Streamlit app."""
     st.set_page_config(page_title=settings.DEMO_WEB_PAGE_TITLE, page_icon="🤖", layout="wide")
+    if settings.WARMUP_ENABLED:
+        # Once per process; the page renders while the index and models load.
+        start_warm_up()
 
     PAGES = {
         "Lumigo": main_content,
@@ -1,10 +1,17 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 
 class DocumentModel(BaseModel):
+    doc_id: str = Field(default="", description="Stable identifier of the source publication")
     title: str = Field(..., description="Title of the document")
     content: str = Field(..., description="Text content or chunk")
     summary: str = Field(..., description="LLM-generated summary")
-    embedding: List[float] = Field(..., description="Embedding vector of the content")
+    embedding: Optional[List[float]] = Field(default=None, description="Embedding vector, filled in by the index build")
     tags: List[str] = Field(default_factory=list, description="Optional tags or labels")
+
+
+class EnrichmentResult(BaseModel):
+    """Summary and topic tags produced for a document in a single LLM call."""
+    summary: str = Field(..., description="Concise summary of the document")
+    tags: List[str] = Field(default_factory=list, description="2-3 broad academic topic tags")
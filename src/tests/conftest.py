@@ -0,0 +1,42 @@
+import os
+import re
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import sandbox
+
+# Settings are read when `core` is first imported: point every test at stand-in
+# providers and a scratch storage directory before any test module imports it.
+# Small chunks, so a short test publication still spans several of them.
+os.environ.setdefault("CHUNK_SIZE_TOKENS", "32")
+os.environ.setdefault("CHUNK_OVERLAP_TOKENS", "0")
+sandbox.configure(tempfile.mkdtemp(prefix="lumigo-test-"), "standin")
+
+
+class WordEncoding:
+    """Stand-in for tiktoken's cl100k_base: one token per word or punctuation mark."""
+
+    name = "cl100k_base"
+
+    def encode(self, text: str, **kwargs) -> list:
+        return list(range(len(re.findall(r"\w+|[^\w\s]", text))))
+
+
+@pytest.fixture(autouse=True)
+def offline_tokenizer(monkeypatch):
+    """tiktoken downloads its encodings on first use; tests count tokens without the network."""
+    import tiktoken
+    from core import budget
+    from utils import data_utils
+
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoding())
+    # Drop splitters and encodings built before (or, on teardown, by) the stand-in.
+    data_utils._token_splitter.cache_clear()
+    budget._encoding.cache_clear()
+    yield
+    data_utils._token_splitter.cache_clear()
+    budget._encoding.cache_clear()
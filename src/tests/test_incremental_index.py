@@ -0,0 +1,171 @@
+"""
+Incremental index updates: diff_publications, update_index and the document store.
+
+    cd src && python -m pytest tests
+"""
+import json
+import os
+
+import faiss
+import pytest
+
+from benchmark import sandbox
+from core import build_faiss_index as indexer
+from core.config import settings
+from core.doc_store import DocumentStore
+from core.index_factory import IndexSpec
+
+LONG_TEXT = " ".join(f"retrieval{i} augmented{i} generation{i}" for i in range(60))
+
+
+def publication(pub_id: str, text: str) -> dict:
+    return {"id": pub_id, "title": f"Publication {pub_id}", "publication_description": text}
+
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    """Every test starts without an index, document store or manifest."""
+    for name in sandbox.INDEX_PATHS:
+        for path in (getattr(settings, name), getattr(settings, name) + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """Write the source publications the indexer reads."""
+    monkeypatch.setattr(indexer, "DATA_DIR", str(tmp_path))
+
+    def write(*publications: dict) -> None:
+        with open(tmp_path / "publications.json", "w", encoding="utf-8") as f:
+            json.dump(list(publications), f)
+
+    return write
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Ids of the chunks each indexing run embeds."""
+    calls = []
+    embed_documents = indexer.embed_documents
+
+    def spy(docs):
+        calls.append([doc.metadata["id"] for doc in docs])
+        return embed_documents(docs)
+
+    monkeypatch.setattr(indexer, "embed_documents", spy)
+    return calls
+
+
+def open_index():
+    return faiss.read_index(settings.FAISS_INDEX_PATH), DocumentStore(settings.FAISS_DOCSTORE_PATH)
+
+
+def index_ids(index) -> set:
+    return set(faiss.vector_to_array(index.id_map).tolist())
+
+
+def chunk_ids(pub_id: str, docstore: DocumentStore) -> set:
+    return set(docstore.vector_ids_for([pub_id]))
+
+
+def assert_in_sync(index, docstore: DocumentStore) -> None:
+    assert index.ntotal == docstore.count()
+    assert index_ids(index) == {row["vector_id"] for row in docstore.rows()}
+
+
+def test_diff_publications():
+    unchanged, changed, new = publication("a", "same"), publication("b", "edited"), publication("c", "new")
+    indexed = {
+        "a": indexer.publication_hash(unchanged["title"], "same"),
+        "b": indexer.publication_hash(changed["title"], "original"),
+        "gone": "stale-hash",
+    }
+
+    to_process, removed = indexer.diff_publications([unchanged, changed, new], indexed)
+
+    assert [pub["id"] for pub in to_process] == ["b", "c"]
+    assert removed == {"gone"}
+
+
+def test_change_replaces_stale_chunks(source, embedded):
+    source(publication("a", LONG_TEXT), publication("b", "kept as it is"))
+    indexer.run_indexing_pipeline()
+    index, docstore = open_index()
+    stale_ids, kept_ids = chunk_ids("a", docstore), chunk_ids("b", docstore)
+    docstore.close()
+    assert len(stale_ids) > 1
+
+    source(publication("a", "now a single short chunk"), publication("b", "kept as it is"))
+    embedded.clear()
+    indexer.run_indexing_pipeline()
+
+    index, docstore = open_index()
+    assert_in_sync(index, docstore)
+    new_ids = chunk_ids("a", docstore)
+    assert new_ids == {indexer.vector_id("a#0")}
+    assert not (stale_ids - new_ids) & (index_ids(index) | {row["vector_id"] for row in docstore.rows()})
+    assert kept_ids <= index_ids(index)
+    assert docstore.get_parent("a")["page_content"] == "now a single short chunk"
+    # Only the changed publication is embedded again.
+    assert embedded == [["a#0"]]
+    docstore.close()
+
+
+def test_remove_drops_vectors_and_parent(source):
+    source(publication("a", LONG_TEXT), publication("b", "short"))
+    indexer.run_indexing_pipeline()
+    _index, docstore = open_index()
+    removed_ids = chunk_ids("a", docstore)
+    docstore.close()
+
+    source(publication("b", "short"))
+    indexer.run_indexing_pipeline()
+
+    index, docstore = open_index()
+    assert_in_sync(index, docstore)
+    assert not removed_ids & index_ids(index)
+    assert chunk_ids("a", docstore) == set()
+    assert docstore.get_parent("a") is None
+    assert index_ids(index) == chunk_ids("b", docstore)
+    docstore.close()
+
+
+def test_unchanged_source_is_a_no_op(source, embedded):
+    source(publication("a", LONG_TEXT), publication("b", "short"))
+    indexer.run_indexing_pipeline()
+    manifest_mtime = os.stat(settings.FAISS_MANIFEST_PATH).st_mtime_ns
+
+    embedded.clear()
+    indexer.run_indexing_pipeline()
+
+    assert embedded == []
+    assert os.stat(settings.FAISS_MANIFEST_PATH).st_mtime_ns == manifest_mtime
+    index, docstore = open_index()
+    assert_in_sync(index, docstore)
+    docstore.close()
+
+
+def test_hnsw_change_rebuilds(source, monkeypatch):
+    hnsw = IndexSpec(index_type="hnsw")
+    source(publication("a", LONG_TEXT), publication("b", "short"))
+    indexer.run_indexing_pipeline(index_spec=hnsw)
+    _index, docstore = open_index()
+    stale_ids = chunk_ids("a", docstore) | chunk_ids("b", docstore)
+    docstore.close()
+
+    def update_index(*args, **kwargs):
+        raise AssertionError("HNSW indexes cannot delete vectors and must be rebuilt")
+
+    monkeypatch.setattr(indexer, "update_index", update_index)
+    source(publication("a", "now a single short chunk"))
+    indexer.run_indexing_pipeline(index_spec=hnsw)
+
+    with open(settings.FAISS_MANIFEST_PATH, "r", encoding="utf-8") as f:
+        assert json.load(f)["index_type"] == "hnsw"
+    index, docstore = open_index()
+    assert_in_sync(index, docstore)
+    assert index_ids(index) == {indexer.vector_id("a#0")}
+    assert not (stale_ids - {indexer.vector_id("a#0")}) & index_ids(index)
+    assert docstore.get_parent("b") is None
+    docstore.close()
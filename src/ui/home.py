@@ -5,8 +5,9 @@ from datetime import datetime
 from collections import Counter
 
 
-from core.multi_graph import build_initial_graph_state, create_graph
-from core.backend import trigger_question, extract_used_doc_indices, split_answer_followups, extract_followups, trigger_build_index
+from core.config import settings
+from core.multi_graph import build_initial_graph_state, stream_graph
+from core.backend import get_graph, get_index_store, trigger_question, extract_used_doc_indices, split_answer_followups, extract_followups, trigger_build_index
 
 
 def init_state_with_history():
@@ -71,7 +72,7 @@ def render_input_area():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-def render_answer_area(graph):
+def render_answer_area():
     with st.expander("📜 Chat History", expanded=False):
         col1, col2 = st.columns([8, 2])
         with col1:
@@ -98,19 +99,34 @@ def render_answer_area(graph):
         query = st.session_state.query
         st.session_state.submitted = False
 
+        # The graph and index are built once per process; reruns that don't submit never touch them.
+        graph = get_graph()
+        get_index_store()
         initial_state = build_initial_graph_state(query)
         initial_state["reference_docs"] = st.session_state.reference_docs
         initial_state["queries"] = [query]
 
         final_state = {}
-        timeline_container = st.empty()
-
-        with st.spinner("Running agent..."):
-            # Simplified invocation
-            final_state = graph.invoke(initial_state)
-
-        timeline_container.empty()
-        st.success("✅ Agent execution complete!")
+        answer_container = st.empty()
+        streamed_answer = ""
+
+        with st.status("Running agent...", expanded=False) as status:
+            for kind, payload in stream_graph(graph, initial_state):
+                if kind == "node":
+                    status.update(label=f"Running agent... ({payload} done)")
+                    status.write(f"✓ {payload}")
+                elif kind == "answer_start":
+                    # A refinement pass regenerates the answer from scratch.
+                    streamed_answer = ""
+                elif kind == "token":
+                    streamed_answer += payload
+                    # Follow-ups and citations are parsed once the answer is complete.
+                    answer_container.markdown(split_answer_followups(streamed_answer)[0])
+                elif kind == "final":
+                    final_state = payload
+            status.update(label="✅ Agent execution complete!", state="complete")
+
+        answer_container.empty()
 
         if final_state and final_state.get("final_answer"):
             final_answer = final_state["final_answer"]
@@ -144,6 +160,33 @@ def render_answer_area(graph):
         elif final_state:
             st.warning("⚠️ No meaningful output from the agent.")
 
+        if settings.TRACING_UI_TIMELINE and final_state.get("spans"):
+            render_timeline(final_state["spans"])
+
+def render_timeline(spans):
+    """Per-span timings of the last request, offset from the start of the request."""
+    with st.expander("⏱️ Timeline", expanded=False):
+        started = min(span["startTimeUnixNano"] for span in spans)
+        depth = {}
+        rows = []
+        for span in spans:
+            depth[span["spanId"]] = depth.get(span["parentSpanId"], -1) + 1
+            attributes = span["attributes"]
+            # Cache spans flag a single hit, embedding spans count them; show both as counts.
+            cache_hits = attributes.get("cache_hits", attributes.get("cache_hit"))
+            rows.append({
+                "span": "\u00a0\u00a0" * depth[span["spanId"]] + span["name"],
+                "kind": span["kind"],
+                "start (ms)": round((span["startTimeUnixNano"] - started) / 1e6, 1),
+                "duration (ms)": round(span["durationMs"], 1),
+                "tokens in": attributes.get("input_tokens"),
+                "tokens out": attributes.get("output_tokens"),
+                "cache hits": int(cache_hits) if cache_hits is not None else None,
+                "docs": attributes.get("documents", attributes.get("retrieved_docs")),
+                "status": span["status"],
+            })
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
 def render_reference_docs():
     with st.expander("📚 Reference Documents", expanded=True):
         if st.session_state.reference_docs:
@@ -153,12 +196,14 @@ def render_reference_docs():
                     if st.button(doc.get("metadata", {}).get("source", f"Document {i+1}"), key=f"ref_doc_{i}"):
                         st.session_state.selected_doc_idx = i
                 with cols[1]:
-                    if st.button("❌", key=f"remove_ref_{i}"):
-                        st.session_state.reference_docs.pop(i)
-                        st.rerun()
+                    st.button("❌", key=f"remove_ref_{i}", on_click=st.session_state.reference_docs.pop, args=(i,))
         else:
             st.info("No reference documents selected.")
 
+def add_reference(doc):
+    if doc not in st.session_state.reference_docs:
+        st.session_state.reference_docs.append(doc)
+
 def render_related_docs():
     # This should now be driven by the final state of the graph after execution
     if st.session_state.get("retrieved_docs") and st.session_state.get("used_indices"):
@@ -169,10 +214,7 @@ def render_related_docs():
             doc = st.session_state["retrieved_docs"][idx]
             cols = st.columns([1, 1, 10])
             with cols[0]:
-                if st.button("➕", key=f"add_ref_{idx}"):
-                    if doc not in st.session_state.reference_docs:
-                        st.session_state.reference_docs.append(doc)
-                        st.rerun()
+                st.button("➕", key=f"add_ref_{idx}", on_click=add_reference, args=(doc,))
             with cols[2]:
                 source_title = doc.get("metadata", {}).get("source", "Unknown Source")
                 with st.expander(f"[{idx+1}] {source_title}"):
@@ -226,6 +268,14 @@ def render_simple_tag_cloud():
     st.markdown("<div style='line-height:2em'>" + " ".join(html_tags) + "</div>", unsafe_allow_html=True)
 
 
+@st.fragment
+def render_preview_panel():
+    """Reference and source panels rerun on their own, so adding or removing a reference leaves the answer area alone."""
+    render_simple_tag_cloud()
+    render_reference_docs()
+    render_related_docs()
+
+
 def main_content():
     init_state_with_history()
     render_sidebar()
@@ -235,13 +285,10 @@ def main_content():
     main_col, preview_col = st.columns([2, 1])
     with main_col:
         render_input_area()
-        graph = create_graph()
-        render_answer_area(graph)
+        render_answer_area()
 
     with preview_col:
-        render_simple_tag_cloud()
-        render_reference_docs()
-        render_related_docs()
+        render_preview_panel()
         
 if __name__ == "__main__":
     main_content()
@@ -3,9 +3,14 @@ import json
 import aiofiles
 import fitz
 import asyncio
+from functools import lru_cache
 
-from utils.embedding_utils import get_text_embedding
-from core.llm_chain import get_summary_async, get_tags_async
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from logger import logger
+from core.config import settings
+from utils.ingest_scheduler import IngestionScheduler
+from core.llm_chain import get_enrichment_cached_async, enrichment_cache
 from schema.doc_schema import DocumentModel
 
 
@@ -18,18 +23,35 @@ def chunk_pdf_text(file_path: str) -> list[str]:
     return chunks
 
 
+@lru_cache(maxsize=8)
+def _token_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="cl100k_base",
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        disallowed_special=(),
+    )
+
+
+def chunk_text_by_tokens(text: str, chunk_size: int = settings.CHUNK_SIZE_TOKENS,
+                         chunk_overlap: int = settings.CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """Split text into chunks of at most `chunk_size` tokens, preferring paragraph and sentence boundaries."""
+    if not text.strip():
+        return [text]
+    return _token_splitter(chunk_size, chunk_overlap).split_text(text)
+
+
 async def load_and_process_pdf_async(file_path: str) -> list[dict]:
     chunks = chunk_pdf_text(file_path)
+    scheduler = IngestionScheduler()
 
     async def process_chunk(chunk: str) -> DocumentModel:
-        summary = await get_summary_async(chunk)
-        tags = await get_tags_async(chunk)
+        enrichment = await get_enrichment_cached_async(chunk, scheduler)
         return DocumentModel(
             title=os.path.basename(file_path),
             content=chunk,
-            summary=summary,
-            embedding=get_text_embedding(summary),
-            tags=tags
+            summary=enrichment.summary,
+            tags=enrichment.tags
         )
 
     docs = await asyncio.gather(*(process_chunk(chunk) for chunk in chunks))
@@ -41,17 +63,24 @@ async def load_and_process_json_async(file_path: str) -> list[dict]:
         raw = await f.read()
         publications = json.loads(raw)
 
+    return await process_publications_async(publications)
+
+
+async def process_publications_async(publications: list[dict]) -> list[dict]:
+    scheduler = IngestionScheduler()
+
     async def process_pub(pub: dict) -> DocumentModel:
         content = pub.get("publication_description", "")
-        summary = await get_summary_async(content)
-        tags = await get_tags_async(content)
+        enrichment = await get_enrichment_cached_async(content, scheduler)
         return DocumentModel(
+            doc_id=pub.get("id", ""),
             title=pub.get("title", ""),
             content=content,
-            summary=summary,
-            embedding=get_text_embedding(summary) or [],
-            tags=tags
+            summary=enrichment.summary,
+            tags=enrichment.tags
         )
 
     docs = await asyncio.gather(*(process_pub(pub) for pub in publications))
+    if enrichment_cache is not None:
+        logger.info(f"[Ingestion] Enrichment cache stats: {enrichment_cache.stats()}")
     return [doc.dict() for doc in docs] 
@@ -1,6 +1,5 @@
 # file: utils/embedding_helper.py
 
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 from typing import List
 import numpy as np
 
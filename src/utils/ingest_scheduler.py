@@ -0,0 +1,83 @@
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from core.config import settings
+from logger import logger
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second, with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 0):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class IngestionScheduler:
+    """
+    Runs provider calls during ingestion with bounded concurrency, a token-bucket
+    rate limit and retries with exponential backoff. Blocking calls (embeddings)
+    run in the event loop's executor so they do not stall other coroutines.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.INGEST_CONCURRENCY,
+        rate_per_second: float = settings.INGEST_RATE_LIMIT_PER_SECOND,
+        max_retries: int = settings.INGEST_MAX_RETRIES,
+        base_delay: float = settings.INGEST_RETRY_BASE_DELAY,
+        max_delay: float = settings.INGEST_RETRY_MAX_DELAY,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bucket = TokenBucket(rate_per_second)
+
+    async def run(self, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Await `func(*args)` under the concurrency and rate limits, retrying on failure."""
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    await self._bucket.acquire()
+                    return await func(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error(f"[IngestionScheduler] {getattr(func, '__name__', func)} failed after {attempt} attempts: {e}")
+                    raise
+                # Full jitter keeps retries from many tasks from arriving in lockstep.
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                logger.warning(
+                    f"[IngestionScheduler] {getattr(func, '__name__', func)} failed ({e}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Like `run`, for a synchronous `func` executed off the event loop."""
+        async def call():
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        call.__name__ = getattr(func, "__name__", "call")
+        return await self.run(call)
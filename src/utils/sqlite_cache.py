@@ -0,0 +1,98 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a single SQLite file.
+
+    Values are raw bytes. When the cache grows beyond `max_entries`, the least
+    recently used entries are evicted. Hit and miss counters are kept per process.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, table: str = "cache"):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table}(last_access)")
+        self._size = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        if not keys:
+            return found
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: bytes) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_access) VALUES (?, ?, ?)",
+                [(key, sqlite3.Binary(value), now) for key, value in items.items()],
+            )
+            self._conn.execute("COMMIT")
+            self._size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Drop an extra 10% so that eviction does not run on every insert once full.
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+            (excess,),
+        )
+        self._size -= excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._size = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._size}